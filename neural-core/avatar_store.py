@@ -0,0 +1,255 @@
+"""
+Decoded avatar frame store.
+
+Each avatar video is decoded once into a raw uint8 RGB frame array saved as an
+`.npy` file next to a JSON metadata sidecar. Renders memory-map the array, so
+every worker process and every request shares one page-cached copy of the
+decoded frames instead of running ffmpeg on the same video again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+STORE_FORMAT_VERSION = 1
+# Frames are streamed to disk behind a fixed-size .npy header, which is filled
+# in once the frame count is known.
+_NPY_HEADER_BYTES = 128
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_HASH_CHUNK_BYTES = 1024 * 1024
+_DECODE_CHUNK_FRAMES = 32
+
+
+@dataclass
+class AvatarFrames:
+    """Memory-mapped decoded frames of one avatar"""
+    key: str
+    frames: np.ndarray
+    fps: float
+    width: int
+    height: int
+    source_path: str
+
+    @property
+    def frame_count(self) -> int:
+        return int(self.frames.shape[0])
+
+
+def _npy_header(shape: tuple[int, ...]) -> bytes:
+    header = repr({"descr": "|u1", "fortran_order": False, "shape": tuple(int(d) for d in shape)}).encode("latin1")
+    padding = _NPY_HEADER_BYTES - len(_NPY_MAGIC) - 2 - len(header) - 1
+    if padding < 0:
+        raise ValueError(f"Frame array shape too large for store header: {shape}")
+    return _NPY_MAGIC + struct.pack("<H", _NPY_HEADER_BYTES - len(_NPY_MAGIC) - 2) + header + b" " * padding + b"\n"
+
+
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+def file_digest(path: Path, memoize: bool = True) -> str:
+    """SHA-256 of the file contents, memoized by path, size and mtime"""
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(_HASH_CHUNK_BYTES), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        # One-off inputs (per-turn audio) skip the memo so it does not grow unbounded.
+        if memoize:
+            _digests[memo_key] = digest
+    return digest
+
+
+def _parse_rate(rate: str | None) -> float:
+    if not rate:
+        return 0.0
+    try:
+        if "/" in rate:
+            num, den = rate.split("/", 1)
+            return float(num) / float(den) if float(den) else 0.0
+        return float(rate)
+    except ValueError:
+        return 0.0
+
+
+def probe_video(video_path: Path) -> dict[str, Any]:
+    """Return width, height, fps and the container's frame count (0 if unknown) of the first video stream"""
+    import ffmpeg
+
+    probe = ffmpeg.probe(str(video_path))
+    video_info = next(s for s in probe["streams"] if s["codec_type"] == "video")
+    fps = _parse_rate(video_info.get("avg_frame_rate")) or _parse_rate(video_info.get("r_frame_rate")) or 25.0
+    try:
+        frame_count = int(video_info.get("nb_frames") or 0)
+    except ValueError:
+        frame_count = 0
+    return {
+        "width": int(video_info["width"]),
+        "height": int(video_info["height"]),
+        "fps": fps,
+        "frame_count": frame_count,
+    }
+
+
+class AvatarFrameStore:
+    """Content-addressed on-disk store of decoded avatar frames"""
+
+    def __init__(self, cache_dir: str | Path):
+        self.cache_dir = Path(cache_dir)
+        self._opened: dict[str, AvatarFrames] = {}
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def content_key(self, video_path: Path) -> str:
+        return file_digest(video_path)
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.cache_dir / f"{key}.npy", self.cache_dir / f"{key}.json"
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def is_registered(self, video_path: Path) -> bool:
+        frames_path, meta_path = self._paths(self.content_key(video_path))
+        return frames_path.exists() and meta_path.exists()
+
+    def register(self, video_path: Path) -> AvatarFrames:
+        """Decode the avatar once if needed and return its memory-mapped frames"""
+        key = self.content_key(video_path)
+        opened = self._opened.get(key)
+        if opened is not None:
+            return opened
+
+        with self._key_lock(key):
+            opened = self._opened.get(key)
+            if opened is not None:
+                return opened
+
+            frames_path, meta_path = self._paths(key)
+            if not (frames_path.exists() and meta_path.exists()):
+                self._decode(video_path, key)
+
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            frames = np.load(str(frames_path), mmap_mode="r")
+            opened = AvatarFrames(
+                key=key,
+                frames=frames,
+                fps=float(meta["fps"]),
+                width=int(meta["width"]),
+                height=int(meta["height"]),
+                source_path=str(meta.get("source_path", video_path)),
+            )
+            self._opened[key] = opened
+            return opened
+
+    async def register_async(self, video_path: Path) -> AvatarFrames:
+        return await asyncio.to_thread(self.register, video_path)
+
+    def _decode(self, video_path: Path, key: str) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        frames_path, meta_path = self._paths(key)
+        info = probe_video(video_path)
+        width, height = info["width"], info["height"]
+        frame_bytes = width * height * 3
+
+        # Unique temp names keep concurrent workers from clobbering each other;
+        # os.replace makes whichever finishes first visible atomically.
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_frames = frames_path.with_name(frames_path.name + suffix)
+        tmp_meta = meta_path.with_name(meta_path.name + suffix)
+
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-i", str(video_path),
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        frame_count = 0
+        try:
+            with tmp_frames.open("wb") as handle:
+                handle.write(b"\0" * _NPY_HEADER_BYTES)
+                while True:
+                    chunk = process.stdout.read(frame_bytes * _DECODE_CHUNK_FRAMES)
+                    if not chunk:
+                        break
+                    usable = len(chunk) - len(chunk) % frame_bytes
+                    handle.write(chunk[:usable])
+                    frame_count += usable // frame_bytes
+                    if usable != len(chunk):
+                        break
+                handle.seek(0)
+                handle.write(_npy_header((frame_count, height, width, 3)))
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f"ffmpeg decode failed: {stderr.decode('utf-8', errors='ignore')}")
+            if frame_count == 0:
+                raise ValueError(f"No frames decoded from avatar: {video_path}")
+
+            tmp_meta.write_text(
+                json.dumps(
+                    {
+                        "version": STORE_FORMAT_VERSION,
+                        "key": key,
+                        "source_path": str(video_path),
+                        "fps": info["fps"],
+                        "width": width,
+                        "height": height,
+                        "frame_count": frame_count,
+                        "created_at": int(time.time()),
+                    }
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp_frames, frames_path)
+            os.replace(tmp_meta, meta_path)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            tmp_frames.unlink(missing_ok=True)
+            tmp_meta.unlink(missing_ok=True)
+
+    def _boxes_path(self, key: str, tag: str) -> Path:
+        return self.cache_dir / f"{key}.faces-{tag}.npy"
+
+    def load_face_boxes(self, video_path: Path, tag: str) -> np.ndarray | None:
+        """Cached (N, 4) int32 face boxes for an avatar, -1 rows where no face was found"""
+        path = self._boxes_path(self.content_key(video_path), tag)
+        try:
+            return np.load(str(path))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_face_boxes(self, video_path: Path, tag: str, boxes: np.ndarray) -> None:
+        """Store face boxes computed under a detection-settings tag"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._boxes_path(self.content_key(video_path), tag)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp_path.open("wb") as handle:
+            np.save(handle, np.asarray(boxes, dtype=np.int32))
+        os.replace(tmp_path, path)
+
+    def evict(self, video_path: Path) -> None:
+        """Drop an avatar's decoded frames and cached face boxes from the store"""
+        key = self.content_key(video_path)
+        self._opened.pop(key, None)
+        for path in self._paths(key):
+            path.unlink(missing_ok=True)
+        for path in self.cache_dir.glob(f"{key}.faces-*.npy"):
+            path.unlink(missing_ok=True)
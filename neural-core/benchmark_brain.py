@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+MARZ Brain CPU Benchmark
+
+Compares the float32 and int8 dynamic-quantized transformers fallback on CPU:
+load time, generation throughput (tokens/sec) and resident memory.
+Each mode runs in its own subprocess so RSS numbers do not bleed into each other.
+The first int8 run includes quantization in its load time; later runs load the
+cached int8 weights from QUANTIZED_MODEL_CACHE_DIR.
+
+Usage: python benchmark_brain.py [--new-tokens 64] [--runs 3] [--modes none,int8]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+PROMPT = (
+    "You are MARZ, an operations assistant. In two short sentences, explain how a small agency "
+    "should prioritise uptime monitoring versus new feature work this quarter."
+)
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_single(mode: str, new_tokens: int, runs: int) -> dict:
+    os.environ["BRAIN_CPU_QUANTIZATION"] = mode
+    os.environ["NEURAL_USE_VLLM"] = "false"
+    os.environ.setdefault("VECTOR_STORE_PATH", os.path.join(tempfile.gettempdir(), "marz-benchmark-store"))
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    import torch
+    import gateway
+
+    engine = gateway.BrainEngine()
+    load_start = time.perf_counter()
+    model, tokenizer, device = engine._load_fallback()
+    load_seconds = time.perf_counter() - load_start
+
+    inputs = tokenizer(PROMPT, return_tensors="pt")
+    inputs = {key: value.to(device) for key, value in inputs.items()}
+
+    with torch.inference_mode():
+        model.generate(**inputs, max_new_tokens=4, do_sample=False, pad_token_id=tokenizer.eos_token_id)
+
+    throughputs: list[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with torch.inference_mode():
+            generated = model.generate(
+                **inputs,
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+        elapsed = time.perf_counter() - start
+        produced = int(generated.shape[-1] - inputs["input_ids"].shape[-1])
+        throughputs.append(produced / elapsed if elapsed > 0 else 0.0)
+
+    return {
+        "mode": mode,
+        "model_id": gateway.settings.neural_model_id,
+        "torch_threads": torch.get_num_threads(),
+        "load_seconds": load_seconds,
+        "tokens_per_second": sum(throughputs) / len(throughputs),
+        "best_tokens_per_second": max(throughputs),
+        "rss_mb": _current_rss_mb(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modes", default="none,int8", help="Comma-separated BRAIN_CPU_QUANTIZATION values")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.new_tokens, args.runs)))
+        return 0
+
+    results: list[dict] = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        print(f"Running {mode} ...", flush=True)
+        completed = subprocess.run(
+            [sys.executable, __file__, "--single", mode, "--new-tokens", str(args.new_tokens), "--runs", str(args.runs)],
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            print(f"❌ {mode} failed:\n{completed.stderr[-2000:]}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        return 1
+
+    print(f"\n{'='*72}")
+    print(f"{'mode':<8}{'load s':>10}{'tok/s':>10}{'best tok/s':>12}{'RSS MB':>10}{'peak MB':>10}{'threads':>10}")
+    print(f"{'-'*72}")
+    for result in results:
+        print(
+            f"{result['mode']:<8}{result['load_seconds']:>10.1f}{result['tokens_per_second']:>10.2f}"
+            f"{result['best_tokens_per_second']:>12.2f}{result['rss_mb']:>10.0f}{result['peak_rss_mb']:>10.0f}"
+            f"{result['torch_threads']:>10}"
+        )
+    print(f"{'='*72}")
+
+    baseline = next((r for r in results if r["mode"] == "none"), None)
+    if baseline:
+        for result in results:
+            if result is baseline or not baseline["tokens_per_second"]:
+                continue
+            speedup = result["tokens_per_second"] / baseline["tokens_per_second"]
+            memory = result["rss_mb"] / baseline["rss_mb"] if baseline["rss_mb"] else 0.0
+            print(f"{result['mode']}: {speedup:.2f}x throughput, {memory:.2f}x RSS vs float32")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Wav2Lip Generator CPU Benchmark
+
+Compares the eager, TorchScript and ONNX Runtime generator backends on CPU:
+load time, generated faces/sec per batch size and resident memory. Each
+backend runs in its own subprocess so RSS numbers do not bleed into each
+other. Export the torchscript/onnx models first with export_wav2lip.py.
+
+Usage: python benchmark_wav2lip.py [--backends eager,torchscript,onnx] [--batch-sizes 1,16,128]
+                                   [--runs 5] [--threads 0] [--checkpoint PATH] [--repo PATH]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as handle:
+            pages = int(handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_single(backend: str, args: argparse.Namespace) -> dict:
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+
+    import torch
+    from wav2lip_backends import example_inputs, load_generator
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    load_start = time.perf_counter()
+    generator = load_generator(backend, "cpu", args.checkpoint, args.repo, threads=args.threads)
+    load_seconds = time.perf_counter() - load_start
+
+    throughput: dict[str, float] = {}
+    for batch_size in [int(b) for b in args.batch_sizes.split(",") if b.strip()]:
+        mel, face = example_inputs(batch_size, (96, 96))
+        with torch.no_grad():
+            # TorchScript's profiling executor specializes the graph over the first calls.
+            for _ in range(2):
+                generator(mel, face)
+            start = time.perf_counter()
+            for _ in range(args.runs):
+                generator(mel, face)
+        elapsed = time.perf_counter() - start
+        throughput[str(batch_size)] = batch_size * args.runs / elapsed if elapsed > 0 else 0.0
+
+    return {
+        "backend": backend,
+        "torch_threads": torch.get_num_threads(),
+        "load_seconds": load_seconds,
+        "faces_per_second": throughput,
+        "rss_mb": _current_rss_mb(),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="eager,torchscript,onnx")
+    parser.add_argument("--batch-sizes", default="1,16,128")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads; 0 keeps the library default")
+    parser.add_argument("--checkpoint", default="/opt/Wav2Lip/checkpoints/wav2lip_gan.pth")
+    parser.add_argument("--repo", default="/opt/Wav2Lip")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args)))
+        return 0
+
+    results: list[dict] = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"Running {backend} ...", flush=True)
+        completed = subprocess.run(
+            [
+                sys.executable, __file__, "--single", backend,
+                "--batch-sizes", args.batch_sizes, "--runs", str(args.runs), "--threads", str(args.threads),
+                "--checkpoint", args.checkpoint, "--repo", args.repo,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            print(f"❌ {backend} failed:\n{completed.stderr[-2000:]}")
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        return 1
+
+    batch_sizes = list(results[0]["faces_per_second"])
+    header = f"{'backend':<13}{'load s':>8}" + "".join(f"{'b=' + b + ' f/s':>14}" for b in batch_sizes)
+    header += f"{'RSS MB':>10}{'peak MB':>10}{'threads':>9}"
+    print(f"\n{'=' * len(header)}")
+    print(header)
+    print(f"{'-' * len(header)}")
+    for result in results:
+        row = f"{result['backend']:<13}{result['load_seconds']:>8.2f}"
+        row += "".join(f"{result['faces_per_second'][b]:>14.1f}" for b in batch_sizes)
+        row += f"{result['rss_mb']:>10.0f}{result['peak_rss_mb']:>10.0f}{result['torch_threads']:>9}"
+        print(row)
+    print(f"{'=' * len(header)}")
+
+    baseline = next((r for r in results if r["backend"] == "eager"), None)
+    if baseline:
+        for result in results:
+            if result is baseline:
+                continue
+            speedups = [
+                result["faces_per_second"][b] / baseline["faces_per_second"][b]
+                for b in batch_sizes
+                if baseline["faces_per_second"][b]
+            ]
+            if speedups:
+                print(f"{result['backend']}: {min(speedups):.2f}x-{max(speedups):.2f}x faces/sec vs eager")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
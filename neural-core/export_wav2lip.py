@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Wav2Lip Generator Export
+
+One-time export of the eager Wav2Lip generator to a frozen TorchScript module
+and/or an ONNX graph, followed by a numerical parity check of each export
+against the eager model on random batches. Run it wherever the Wav2Lip repo
+checkout and checkpoint are available; the exported files are all the
+torchscript/onnx backends need at runtime.
+
+Usage: python export_wav2lip.py [--backends torchscript,onnx] [--checkpoint PATH] [--repo PATH]
+                                [--output-dir DIR] [--atol 1e-3] [--check-only]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import torch
+
+from wav2lip_backends import (
+    GENERATOR_BACKENDS,
+    example_inputs,
+    export_onnx,
+    export_torchscript,
+    exported_model_path,
+    load_eager_generator,
+    load_generator,
+)
+
+EXPORTERS = {"torchscript": export_torchscript, "onnx": export_onnx}
+
+
+def check_parity(
+    eager: torch.nn.Module,
+    exported,
+    face_resolution: tuple[int, int],
+    batch_sizes: list[int],
+) -> float:
+    """Largest absolute difference between eager and exported outputs across the batch sizes"""
+    worst = 0.0
+    torch.manual_seed(0)
+    for batch_size in batch_sizes:
+        mel, face = example_inputs(batch_size, face_resolution)
+        with torch.no_grad():
+            expected = eager(mel, face)
+            actual = exported(mel, face)
+        if tuple(actual.shape) != tuple(expected.shape):
+            raise AssertionError(f"shape mismatch at batch {batch_size}: {tuple(actual.shape)} vs {tuple(expected.shape)}")
+        worst = max(worst, float((actual - expected).abs().max()))
+    return worst
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torchscript,onnx")
+    parser.add_argument("--checkpoint", default="/opt/Wav2Lip/checkpoints/wav2lip_gan.pth")
+    parser.add_argument("--repo", default="/opt/Wav2Lip")
+    parser.add_argument("--output-dir", help="Defaults to the checkpoint's directory")
+    parser.add_argument("--face-size", type=int, default=96)
+    parser.add_argument("--batch-sizes", default="1,7,32", help="Batch sizes used for the parity check")
+    parser.add_argument("--atol", type=float, default=1e-3, help="Max allowed absolute difference (outputs are in [0, 1])")
+    parser.add_argument("--check-only", action="store_true", help="Skip exporting; check existing exports")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = [b for b in backends if b not in EXPORTERS]
+    if unknown:
+        print(f"❌ Unknown backend(s) {', '.join(unknown)}; choose from {', '.join(b for b in GENERATOR_BACKENDS if b in EXPORTERS)}")
+        return 2
+
+    face_resolution = (args.face_size, args.face_size)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    eager = load_eager_generator(args.repo, args.checkpoint, "cpu")
+    print(f"Loaded eager generator from {args.checkpoint}")
+
+    failed = False
+    for backend in backends:
+        path = exported_model_path(args.checkpoint, backend)
+        if args.output_dir:
+            path = Path(args.output_dir) / path.name
+        if not args.check_only:
+            EXPORTERS[backend](eager, path, face_resolution)
+            print(f"Exported {backend}: {path} ({path.stat().st_size / (1024 * 1024):.1f}MB)")
+
+        exported = load_generator(backend, "cpu", args.checkpoint, args.repo, exported_path=str(path))
+        max_diff = check_parity(eager, exported, face_resolution, batch_sizes)
+        if max_diff <= args.atol:
+            print(f"✅ {backend} parity: max |diff| {max_diff:.2e} <= {args.atol:.0e}")
+        else:
+            print(f"❌ {backend} parity: max |diff| {max_diff:.2e} > {args.atol:.0e}")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
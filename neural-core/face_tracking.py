@@ -0,0 +1,118 @@
+"""
+Keyframe face tracking helpers for the Wav2Lip pipeline.
+
+The face detector runs only on keyframes (every N frames and at scene cuts);
+boxes in between are propagated by template matching against the keyframe's
+face at reduced scale, then temporally smoothed per shot the way upstream
+Wav2Lip's `get_smoothened_boxes` does.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+_THUMBNAIL_SIZE = (64, 36)
+# Template width in pixels after downscaling; keeps matchTemplate cheap.
+_TEMPLATE_WIDTH = 48
+
+
+def gray_thumbnails(frames: np.ndarray) -> np.ndarray:
+    """Small grayscale copies of every frame, used for scene cut detection"""
+    import cv2
+
+    thumbnails = np.empty((len(frames), _THUMBNAIL_SIZE[1], _THUMBNAIL_SIZE[0]), dtype=np.float32)
+    for index, frame in enumerate(frames):
+        small = cv2.resize(np.asarray(frame), _THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        thumbnails[index] = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    return thumbnails
+
+
+def scene_cuts(thumbnails: np.ndarray, threshold: float) -> np.ndarray:
+    """Indices of frames whose mean absolute difference from the previous frame exceeds threshold"""
+    if len(thumbnails) < 2:
+        return np.zeros(0, dtype=np.int64)
+    diffs = np.abs(np.diff(thumbnails, axis=0)).mean(axis=(1, 2))
+    return np.flatnonzero(diffs > threshold) + 1
+
+
+def keyframe_indices(count: int, interval: int, cuts: np.ndarray) -> np.ndarray:
+    keyframes = np.union1d(np.arange(0, count, max(1, interval)), cuts)
+    return keyframes.astype(np.int64)
+
+
+def get_smoothened_boxes(boxes: np.ndarray, window: int) -> np.ndarray:
+    """Forward moving average over `window` boxes, clamped at the tail"""
+    count = len(boxes)
+    if count <= 1 or window <= 1:
+        return boxes.astype(np.float64)
+    window = min(window, count)
+    cumulative = np.concatenate([np.zeros((1, boxes.shape[1])), np.cumsum(boxes, axis=0, dtype=np.float64)])
+    starts = np.minimum(np.arange(count), count - window)
+    return (cumulative[starts + window] - cumulative[starts]) / window
+
+
+class TemplateTracker:
+    """Follows one keyframe face box through later frames by normalized cross-correlation"""
+
+    def __init__(self, frame: np.ndarray, box: np.ndarray, search_margin: float = 0.25):
+        import cv2
+
+        x1, y1, x2, y2 = (int(v) for v in box)
+        self.size = (x2 - x1, y2 - y1)
+        self.scale = min(1.0, _TEMPLATE_WIDTH / max(1, self.size[0]))
+        self.search_margin = search_margin
+        self.box = np.array([x1, y1, x2, y2], dtype=np.int32)
+        self.template = self._prepare(cv2, frame[y1:y2, x1:x2])
+
+    def _prepare(self, cv2, region: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(np.ascontiguousarray(region), cv2.COLOR_RGB2GRAY)
+        if self.scale < 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def track(self, frame: np.ndarray) -> tuple[np.ndarray, float]:
+        """Search around the last position; returns the new box and the match score"""
+        import cv2
+
+        height, width = frame.shape[:2]
+        box_w, box_h = self.size
+        x1, y1 = int(self.box[0]), int(self.box[1])
+        margin_x = int(box_w * self.search_margin)
+        margin_y = int(box_h * self.search_margin)
+        sx1, sy1 = max(0, x1 - margin_x), max(0, y1 - margin_y)
+        sx2, sy2 = min(width, x1 + box_w + margin_x), min(height, y1 + box_h + margin_y)
+
+        region = self._prepare(cv2, frame[sy1:sy2, sx1:sx2])
+        if region.shape[0] < self.template.shape[0] or region.shape[1] < self.template.shape[1]:
+            return self.box.copy(), 0.0
+        scores = cv2.matchTemplate(region, self.template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, (best_x, best_y) = cv2.minMaxLoc(scores)
+
+        new_x = min(max(0, sx1 + int(round(best_x / self.scale))), max(0, width - box_w))
+        new_y = min(max(0, sy1 + int(round(best_y / self.scale))), max(0, height - box_h))
+        self.box = np.array([new_x, new_y, new_x + box_w, new_y + box_h], dtype=np.int32)
+        return self.box.copy(), float(best)
+
+
+def smooth_tracks(
+    boxes: list[Optional[np.ndarray]],
+    cuts: np.ndarray,
+    window: int,
+) -> list[Optional[np.ndarray]]:
+    """Smooth each run of consecutive boxes, never across a scene cut or a missing face"""
+    smoothed: list[Optional[np.ndarray]] = list(boxes)
+    cut_set = set(int(c) for c in cuts)
+    start = 0
+    count = len(boxes)
+    while start < count:
+        if boxes[start] is None:
+            start += 1
+            continue
+        end = start + 1
+        while end < count and boxes[end] is not None and end not in cut_set:
+            end += 1
+        run = get_smoothened_boxes(np.stack(boxes[start:end]).astype(np.float64), window)
+        for offset, box in enumerate(np.rint(run).astype(np.int32)):
+            smoothed[start + offset] = box
+        start = end
+    return smoothed
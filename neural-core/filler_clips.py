@@ -0,0 +1,221 @@
+"""
+Pre-rendered filler clips for MARZ.
+
+Short acknowledgement clips ("Let me think about that...") are rendered offline
+per avatar and voice with the same TTS and lip-sync engines as live answers.
+The gateway sends one right after a request is accepted, chosen by sentiment
+label, so the avatar responds immediately while the real answer is produced.
+
+Usage: python filler_clips.py --avatar /workspace/neural-core/assets/marz-face.mp4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from avatar_store import file_digest
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_CLIP_CACHE_BYTES = 64 * 1024 * 1024
+
+# Keyed by SentimentAnalysisV2 labels.
+FILLER_PHRASES: dict[str, list[str]] = {
+    "neutral": [
+        "Let me think about that for a moment.",
+        "Good question. Give me a second.",
+        "Alright, let me pull that together.",
+    ],
+    "positive": [
+        "Love that. Let me work on it.",
+        "Great, I'm on it right now.",
+        "Oh, that's a good one. One moment.",
+    ],
+    "distressed": [
+        "I hear you. Let me look at this carefully.",
+        "Okay, I'm with you. Give me a moment.",
+        "Understood. Let's work through this together.",
+    ],
+}
+DEFAULT_LABEL = "neutral"
+
+
+@dataclass
+class FillerClip:
+    label: str
+    text: str
+    path: Path
+    video_format: str = "mp4"
+
+
+SynthesizeFn = Callable[[str, Path], Awaitable[None]]
+RenderFn = Callable[[Path, Path, Path], Awaitable[Path]]
+
+
+def voice_key(model_id: str, voice_sample: Optional[str]) -> str:
+    """Key for a TTS voice: the model id plus the voice sample's contents, not its file name"""
+    sample = Path(voice_sample) if voice_sample else None
+    # A missing sample falls back to the model's default voice, as synthesis does.
+    sample_digest = file_digest(sample) if sample is not None and sample.exists() else ""
+    raw = f"{model_id}|{sample_digest}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class FillerClipCatalog:
+    """Filler clip libraries on disk, one per (avatar, voice) pair"""
+
+    def __init__(self, root_dir: str | Path, voice_id: str, max_cache_bytes: int = DEFAULT_CLIP_CACHE_BYTES):
+        self.root_dir = Path(root_dir)
+        self.voice_id = voice_id
+        self.max_cache_bytes = max_cache_bytes
+        self._libraries: dict[Path, tuple[float, dict[str, list[FillerClip]]]] = {}
+        self._cursor: dict[tuple[Path, str], int] = {}
+        # LRU of clip contents keyed by (path, mtime), bounded by max_cache_bytes in total.
+        self._clip_bytes: OrderedDict[tuple[Path, int], bytes] = OrderedDict()
+        self._cached_bytes = 0
+        self._clip_lock = threading.Lock()
+
+    def library_dir(self, avatar_path: Path) -> Path:
+        return self.root_dir / f"{file_digest(avatar_path)[:16]}-{self.voice_id}"
+
+    def _load_library(self, library: Path) -> dict[str, list[FillerClip]]:
+        manifest_path = library / MANIFEST_NAME
+        if not manifest_path.exists():
+            return {}
+        mtime = manifest_path.stat().st_mtime
+        cached = self._libraries.get(library)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        clips: dict[str, list[FillerClip]] = {}
+        for label, entries in (manifest.get("clips") or {}).items():
+            for entry in entries:
+                path = library / str(entry["file"])
+                if path.exists():
+                    clips.setdefault(label, []).append(
+                        FillerClip(label=label, text=str(entry.get("text", "")), path=path)
+                    )
+        self._libraries[library] = (mtime, clips)
+        return clips
+
+    def pick(self, avatar_path: Path, label: str) -> Optional[FillerClip]:
+        """Rotate through the clips for a sentiment label, falling back to neutral"""
+        if not avatar_path.exists():
+            return None
+        library = self.library_dir(avatar_path)
+        clips = self._load_library(library)
+        choices = clips.get(label) or clips.get(DEFAULT_LABEL) or []
+        if not choices:
+            return None
+        cursor_key = (library, label)
+        index = self._cursor.get(cursor_key, 0)
+        self._cursor[cursor_key] = index + 1
+        return choices[index % len(choices)]
+
+    def read_clip(self, clip: FillerClip) -> bytes:
+        key = (clip.path, clip.path.stat().st_mtime_ns)
+        with self._clip_lock:
+            data = self._clip_bytes.get(key)
+            if data is not None:
+                self._clip_bytes.move_to_end(key)
+                return data
+        data = clip.path.read_bytes()
+        if len(data) > self.max_cache_bytes:
+            return data
+        with self._clip_lock:
+            if key not in self._clip_bytes:
+                self._clip_bytes[key] = data
+                self._cached_bytes += len(data)
+            while self._cached_bytes > self.max_cache_bytes:
+                _, evicted = self._clip_bytes.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return data
+
+    async def pick_with_bytes(self, avatar_path: Path, label: str) -> Optional[tuple[FillerClip, bytes]]:
+        def _pick() -> Optional[tuple[FillerClip, bytes]]:
+            clip = self.pick(avatar_path, label)
+            if clip is None:
+                return None
+            return clip, self.read_clip(clip)
+
+        return await asyncio.to_thread(_pick)
+
+    async def build(
+        self,
+        avatar_path: Path,
+        synthesize: SynthesizeFn,
+        render: RenderFn,
+        phrases: Optional[dict[str, list[str]]] = None,
+    ) -> Path:
+        """Render every phrase for this avatar and voice and write the manifest"""
+        library = self.library_dir(avatar_path)
+        library.mkdir(parents=True, exist_ok=True)
+        manifest_clips: dict[str, list[dict[str, str]]] = {}
+
+        for label, texts in (phrases or FILLER_PHRASES).items():
+            for index, text in enumerate(texts):
+                file_name = f"{label}-{index}.mp4"
+                with tempfile.TemporaryDirectory(prefix="marz-filler-") as workdir:
+                    work = Path(workdir)
+                    wav_path = work / "voice.wav"
+                    video_path = work / "clip.mp4"
+                    await synthesize(text, wav_path)
+                    final_path = await render(avatar_path, wav_path, video_path)
+                    (library / file_name).write_bytes(final_path.read_bytes())
+                manifest_clips.setdefault(label, []).append({"file": file_name, "text": text})
+                print(f"[filler] rendered {label}/{index}: {text}")
+
+        manifest = {
+            "avatar": str(avatar_path),
+            "avatar_sha256": file_digest(avatar_path),
+            "voice_id": self.voice_id,
+            "created_at": int(time.time()),
+            "clips": manifest_clips,
+        }
+        tmp_manifest = library / f".{MANIFEST_NAME}.tmp"
+        tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        tmp_manifest.replace(library / MANIFEST_NAME)
+        return library
+
+
+async def _build_with_gateway_engines(avatar_path: Path) -> Path:
+    import gateway
+
+    async def _render(avatar: Path, wav: Path, out: Path) -> Path:
+        try:
+            await gateway.lipsync.render(avatar, wav, out)
+            return out
+        except Exception as error:
+            print(f"[filler] lipsync unavailable; muxing audio onto avatar: {error!r}")
+            return await gateway.mux_audio_onto_avatar(avatar, wav, out.with_name("muxed.mp4"))
+
+    return await gateway.filler_clips.build(avatar_path, gateway.voice.synthesize, _render)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the filler clip library for an avatar.")
+    parser.add_argument("--avatar", help="Avatar video (defaults to DEFAULT_AVATAR_VIDEO)")
+    args = parser.parse_args()
+
+    import gateway
+
+    avatar_path = Path(args.avatar or gateway.settings.default_avatar_video)
+    if not avatar_path.exists():
+        print(f"Avatar not found: {avatar_path}")
+        return 1
+    library = asyncio.run(_build_with_gateway_engines(avatar_path))
+    print(f"[filler] library ready: {library}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,10 @@
 import asyncio
 import base64
 import gc
+import hashlib
 import json
 import os
+import re
 import tempfile
 import time
 import traceback
@@ -13,11 +15,17 @@ from urllib.parse import urlparse
 
 import httpx
 import soundfile as sf
+from avatar_store import AvatarFrameStore
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
+from filler_clips import FillerClipCatalog, voice_key
+from model_host import ModelHostClient, RemoteBrainEngine, RemoteLipSyncEngine, RemoteSovereignVoice
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from reflection_engine import run_once as run_reflection_once
+from resource_plan import build_plan, pin_process, thread_env
+from tts_workers import TTSProcessPool, load_tts, synthesize_array
+from viseme_lipsync import VisemeLipSyncEngine
 from voice_config import VOICE_PARAMS, apply_wit_filter
 
 os.environ.setdefault("COQUI_TOS_AGREED", "1")
@@ -42,12 +50,24 @@ class Settings(BaseSettings):
     )
     xtts_model_id: str = VOICE_PARAMS.get("model_name", "tts_models/multilingual/multi-dataset/xtts_v2")
     sovereign_voice_sample: str | None = None
+    # Number of TTS worker processes, each holding its own model copy; sentences of a
+    # turn are synthesized in parallel. 0 keeps a single in-process model.
+    tts_workers: int = 0
     wav2lip_checkpoint_url: str | None = (
         (os.getenv("WAV2LIP_CHECKPOINT_URL") or "").replace("\r", "").replace("\n", "").strip() or None
     )
     wav2lip_checkpoint_path: str = "/opt/Wav2Lip/checkpoints/wav2lip_gan.pth"
     wav2lip_repo_path: str = "/opt/Wav2Lip"
     default_avatar_video: str = "/workspace/neural-core/assets/marz-face.mp4"
+    # Lip-sync backend: "wav2lip" (GAN, GPU-oriented), "viseme" (precomputed viseme
+    # atlas composited on CPU) or "auto" (viseme when no CUDA device is available).
+    lipsync_backend: str = "auto"
+    avatar_cache_dir: str = "/workspace/neural-core/data/avatars"
+    # Pre-rendered acknowledgement clips played while the real answer renders
+    # (build them with `python filler_clips.py`).
+    enable_filler_clips: bool = True
+    filler_clip_dir: str = "/workspace/neural-core/data/filler-clips"
+    filler_clip_cache_mb: int = 64
     constitution_path: str = "/workspace/neural-core/constitution.md"
     vector_store_path: str = "/workspace/neural-core/data/chroma"
     memory_vault_url: str | None = None
@@ -55,11 +75,30 @@ class Settings(BaseSettings):
     target_audio_video_offset_ms: int = 35
     max_audio_video_offset_ms: int = 50
     use_vllm: bool = os.getenv("NEURAL_USE_VLLM", "true").lower() != "false"
+    # CPU-only transformers fallback: "int8" (opt-in) applies dynamic int8 quantization
+    # to the linear layers and caches the result on disk; "none" keeps float32 weights.
+    brain_cpu_quantization: str = "none"
+    quantized_model_cache_dir: str = "/workspace/neural-core/data/quantized"
 
     host: str = os.getenv("HOST", "0.0.0.0")
     port: int = int(os.getenv("PORT", "8080"))
     idle_timeout_seconds: int = 600
 
+    # When set, brain/TTS/lip-sync calls are forwarded to the shared model host
+    # process listening on this Unix socket (see model_host.py and start.sh).
+    model_host_socket: str | None = None
+
+    # CPU partitioning between stages. Core lists use "0-3,8" syntax; stages left
+    # empty share the remaining cores automatically. Thread counts of 0 mean one
+    # intra-op thread per assigned core.
+    cpu_partitioning: bool = True
+    brain_cpu_cores: str = ""
+    tts_cpu_cores: str = ""
+    lipsync_cpu_cores: str = ""
+    brain_threads: int = 0
+    tts_threads: int = 0
+    lipsync_threads: int = 0
+
     hibernate_webhook_url: str | None = None
     hibernate_auth_token: str | None = None
     hibernate_signal_name: str = "Hibernate"
@@ -68,6 +107,22 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+resource_plan = build_plan(
+    {
+        "brain": settings.brain_cpu_cores,
+        "tts": settings.tts_cpu_cores,
+        "lipsync": settings.lipsync_cpu_cores,
+    },
+    {
+        "brain": settings.brain_threads,
+        "tts": settings.tts_threads,
+        "lipsync": settings.lipsync_threads,
+    },
+    enabled=settings.cpu_partitioning,
+    # With TTS_WORKERS > 0 speech runs in worker processes that set their own thread counts.
+    local_stages=("brain", "lipsync") if settings.tts_workers > 0 else ("brain", "tts", "lipsync"),
+)
+
 ALLOWED_OUTBOUND_HOSTS = {
     "api.tavily.com",
     "opsvantage-ai-builder-1018462465472.europe-west4.run.app",
@@ -355,6 +410,18 @@ memory_store = SovereignMemoryStore()
 CONSTITUTION_TEXT = load_constitution_text()
 
 
+def _local_model_revision(model_id: str) -> str:
+    """Fingerprint of a local model directory's files; hub models use their commit hash instead"""
+    root = Path(model_id)
+    if not root.is_dir():
+        return "unversioned"
+    digest = hashlib.sha256()
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        stat = path.stat()
+        digest.update(f"{path.relative_to(root)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return f"local{digest.hexdigest()[:12]}"
+
+
 class BrainEngine:
     def __init__(self) -> None:
         self._llm: Any | None = None
@@ -414,11 +481,14 @@ class BrainEngine:
             dtype = torch.float16 if torch.cuda.is_available() else torch.float32
             device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-            model = AutoModelForCausalLM.from_pretrained(
-                model_id,
-                torch_dtype=dtype,
-                trust_remote_code=True,
-            )
+            if device.type == "cpu" and settings.brain_cpu_quantization.lower() == "int8":
+                model = self._load_cpu_int8(model_id, AutoModelForCausalLM)
+            else:
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_id,
+                    torch_dtype=dtype,
+                    trust_remote_code=True,
+                )
             model.to(device)
             model.eval()
 
@@ -428,6 +498,73 @@ class BrainEngine:
 
         return self._fallback_model, self._fallback_tokenizer, self._fallback_device
 
+    def _load_cpu_int8(self, model_id: str, model_cls: Any) -> Any:
+        import torch
+        import transformers  # type: ignore
+
+        config = transformers.AutoConfig.from_pretrained(model_id, trust_remote_code=True)
+        # The cache holds the quantized state_dict, which only fits the exact weights, model
+        # code and library versions it was built from, so all of them go into the key.
+        revision = getattr(config, "_commit_hash", None) or _local_model_revision(model_id)
+        safe_id = re.sub(r"[^A-Za-z0-9._-]+", "--", model_id)
+        cache_name = f"state-int8-{revision}-torch{torch.__version__}-transformers{transformers.__version__}.pt"
+        cache_path = Path(settings.quantized_model_cache_dir) / safe_id / re.sub(r"[^A-Za-z0-9._-]+", "-", cache_name)
+
+        if cache_path.exists():
+            try:
+                model = self._build_int8_from_state(model_id, model_cls, config, cache_path)
+                print(f"[BrainEngine] Loaded cached int8 model: {cache_path}")
+                return model
+            except Exception as exc:
+                print(f"[BrainEngine] Cached int8 model unusable; re-quantizing. Error: {exc}")
+                cache_path.unlink(missing_ok=True)
+
+        model = model_cls.from_pretrained(
+            model_id,
+            torch_dtype=torch.float32,
+            trust_remote_code=True,
+            low_cpu_mem_usage=True,
+        )
+        model.eval()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            torch.save(model.state_dict(), str(tmp_path))
+            tmp_path.replace(cache_path)
+            print(f"[BrainEngine] Cached int8 model: {cache_path}")
+        except Exception as exc:
+            print(f"[BrainEngine] Unable to cache int8 model: {exc}")
+            tmp_path.unlink(missing_ok=True)
+        return model
+
+    def _build_int8_from_state(self, model_id: str, model_cls: Any, config: Any, cache_path: Path) -> Any:
+        """Rebuild the quantized module structure from the config, then load the cached weights into it"""
+        import contextlib
+
+        import torch
+        import transformers  # type: ignore
+
+        # Tensors only, no pickled classes: safe to load with weights_only.
+        state = torch.load(str(cache_path), map_location="cpu", weights_only=True)
+        try:
+            from transformers.modeling_utils import no_init_weights  # type: ignore
+        except Exception:
+            no_init_weights = contextlib.nullcontext
+        # from_config resolves the model class (including remote code) without reading the
+        # float32 checkpoint; its random initialization is skipped since every weight is replaced.
+        with no_init_weights():
+            model = model_cls.from_config(config, torch_dtype=torch.float32, trust_remote_code=True)
+        model.eval()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.load_state_dict(state, strict=True)
+        try:
+            model.generation_config = transformers.GenerationConfig.from_pretrained(model_id)
+        except Exception:
+            pass
+        return model
+
     async def infer(self, prompt: str, sentiment_profile: dict[str, Any] | None = None) -> str:
         def _run() -> str:
             memory_context = memory_store.query_context(prompt, top_k=3)
@@ -483,116 +620,41 @@ class BrainEngine:
             text = tokenizer.decode(output_ids, skip_special_tokens=True)
             return text.strip() or "No response generated."
 
-        return await asyncio.to_thread(_run)
+        return await resource_plan.run("brain", _run)
 
 
 class SovereignVoice:
     def __init__(self) -> None:
         self._tts: Any | None = None
+        self._pool: TTSProcessPool | None = None
+        if settings.tts_workers > 0:
+            tts_stage = resource_plan.stage("tts")
+            self._pool = TTSProcessPool(
+                settings.xtts_model_id,
+                settings.tts_workers,
+                torch_threads=(tts_stage.threads // settings.tts_workers) or None,
+                cores=tts_stage.cores,
+            )
 
     def _load(self) -> Any:
-        from TTS.api import TTS
-
-        def _force_cpu_float32(model: Any) -> None:
-            try:
-                import torch
-
-                if hasattr(model, "to"):
-                    model.to(torch.device("cpu"))
-                if hasattr(model, "float"):
-                    model.float()
-            except Exception:
-                return
-
-        def _force_tts_cpu_float32(tts: Any) -> None:
-            try:
-                synth = getattr(tts, "synthesizer", None)
-                if synth is None:
-                    return
-
-                for attr in ("tts_model", "vocoder_model", "model"):
-                    m = getattr(synth, attr, None)
-                    if m is not None:
-                        _force_cpu_float32(m)
-            except Exception:
-                return
-
         if self._tts is None:
-            try:
-                import torch
-
-                torch.set_default_dtype(torch.float32)
-            except Exception:
-                pass
-            self._tts = TTS(settings.xtts_model_id, gpu=False)
-            _force_tts_cpu_float32(self._tts)
+            self._tts = load_tts(settings.xtts_model_id)
         return self._tts
 
-    async def synthesize(self, text: str, out_wav: Path) -> None:
-        def _run() -> None:
-            tts = self._load()
-
-            tts_kwargs = {
-                "temperature": VOICE_PARAMS.get("temperature"),
-                "length_penalty": VOICE_PARAMS.get("length_penalty"),
-                "repetition_penalty": VOICE_PARAMS.get("repetition_penalty"),
-                "top_k": VOICE_PARAMS.get("top_k"),
-                "top_p": VOICE_PARAMS.get("top_p"),
-                "speed": VOICE_PARAMS.get("speed"),
-                "emotion": VOICE_PARAMS.get("emotion"),
-            }
-            tts_kwargs = {key: value for key, value in tts_kwargs.items() if value is not None}
+    def _voice_sample(self) -> str | None:
+        sample = settings.sovereign_voice_sample
+        return sample if sample and Path(sample).exists() else None
 
-            if settings.sovereign_voice_sample and Path(settings.sovereign_voice_sample).exists():
-                try:
-                    tts.tts_to_file(
-                        text=text,
-                        file_path=str(out_wav),
-                        speaker_wav=settings.sovereign_voice_sample,
-                        **tts_kwargs,
-                    )
-                except TypeError:
-                    fallback_kwargs = {key: value for key, value in tts_kwargs.items() if key != "emotion"}
-                    tts.tts_to_file(
-                        text=text,
-                        file_path=str(out_wav),
-                        speaker_wav=settings.sovereign_voice_sample,
-                        **fallback_kwargs,
-                    )
-            else:
-                speaker: str | None = None
-                try:
-                    speakers = getattr(tts, "speakers", None)
-                    if isinstance(speakers, (list, tuple)) and speakers:
-                        speaker = str(speakers[0])
-                except Exception:
-                    speaker = None
-
-                # Skip language detection - model is not multi-lingual
-                language: str | None = None
-
-                base_kwargs = dict(tts_kwargs)
-                if speaker:
-                    base_kwargs.setdefault("speaker", speaker)
-
-                # Prefer writing directly to a wav file when supported.
-                for drop_keys in ((), ("emotion",), ("emotion", "speaker")):
-                    attempt_kwargs = {k: v for k, v in base_kwargs.items() if k not in drop_keys}
-                    try:
-                        if hasattr(tts, "tts_to_file"):
-                            tts.tts_to_file(text=text, file_path=str(out_wav), **attempt_kwargs)
-                            return
-                        wav = tts.tts(text=text, **attempt_kwargs)
-                        sf.write(str(out_wav), wav, 24000)
-                        return
-                    except TypeError:
-                        continue
+    async def synthesize(self, text: str, out_wav: Path) -> None:
+        if self._pool is not None:
+            await self._pool.synthesize(text, out_wav, voice_sample=self._voice_sample())
+            return
 
-                # Last resort: call tts() with no extras.
-                wav = tts.tts(text=text)
-                sf.write(str(out_wav), wav, 24000)
+        def _run() -> None:
+            wav, sample_rate = synthesize_array(self._load(), text, self._voice_sample())
+            sf.write(str(out_wav), wav, sample_rate)
 
-        await asyncio.to_thread(_run)
+        await resource_plan.run("tts", _run)
 
 
 def clamp_tts_text(text: str, max_chars: int = 280) -> str:
@@ -631,6 +693,28 @@ def ensure_min_tts_text(text: str, min_chars: int = 32) -> str:
 
 
 class LipSyncEngine:
+    def __init__(self) -> None:
+        self._viseme: VisemeLipSyncEngine | None = None
+
+    def backend(self) -> str:
+        configured = (settings.lipsync_backend or "auto").strip().lower()
+        if configured in {"wav2lip", "viseme"}:
+            return configured
+        try:
+            import torch
+
+            return "wav2lip" if torch.cuda.is_available() else "viseme"
+        except Exception:
+            return "viseme"
+
+    def viseme_engine(self) -> VisemeLipSyncEngine:
+        if self._viseme is None:
+            self._viseme = VisemeLipSyncEngine(
+                AvatarFrameStore(settings.avatar_cache_dir),
+                executor=resource_plan.executor("lipsync"),
+            )
+        return self._viseme
+
     async def _ensure_checkpoint(self) -> None:
         checkpoint = Path(settings.wav2lip_checkpoint_path)
         if checkpoint.exists():
@@ -710,6 +794,10 @@ class LipSyncEngine:
         if not face_video.exists():
             raise FileNotFoundError(f"Avatar source not found: {face_video}")
 
+        if self.backend() == "viseme":
+            await self.viseme_engine().render(face_video, audio_wav, out_mp4)
+            return
+
         await self._ensure_checkpoint()
 
         command = [
@@ -725,12 +813,17 @@ class LipSyncEngine:
             str(out_mp4),
         ]
 
+        lipsync_stage = resource_plan.stage("lipsync")
         process = await asyncio.create_subprocess_exec(
             *command,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             cwd=settings.wav2lip_repo_path,
+            env={**os.environ, **thread_env(lipsync_stage.threads)},
         )
+        # Pinned right after spawn; torch/OpenCV worker threads are created later
+        # during imports and inherit the mask.
+        pin_process(process.pid, lipsync_stage.cores)
         _, stderr = await process.communicate()
         if process.returncode != 0:
             details = stderr.decode("utf-8", errors="ignore")
@@ -974,10 +1067,21 @@ async def mux_audio_onto_avatar(avatar_video: Path, audio_wav: Path, out_mp4: Pa
     return out_mp4
 
 
-brain = BrainEngine()
-voice = SovereignVoice()
-lipsync = LipSyncEngine()
+brain: Any = BrainEngine()
+voice: Any = SovereignVoice()
+lipsync: Any = LipSyncEngine()
+model_host: ModelHostClient | None = None
+if settings.model_host_socket:
+    model_host = ModelHostClient(settings.model_host_socket)
+    brain = RemoteBrainEngine(model_host)
+    voice = RemoteSovereignVoice(model_host)
+    lipsync = RemoteLipSyncEngine(model_host)
 sentiment_analysis_v2 = SentimentAnalysisV2()
+filler_clips = FillerClipCatalog(
+    settings.filler_clip_dir,
+    voice_key(settings.xtts_model_id, settings.sovereign_voice_sample),
+    max_cache_bytes=settings.filler_clip_cache_mb * 1024 * 1024,
+)
 
 
 def safe_json(data: dict[str, Any]) -> str:
@@ -1056,13 +1160,23 @@ async def startup() -> None:
 
 @app.get("/health")
 async def health() -> JSONResponse:
-    return JSONResponse(
-        {
-            "ok": True,
-            "idle_timeout_seconds": settings.idle_timeout_seconds,
-            "hibernate_configured": bool(settings.hibernate_webhook_url),
-        }
-    )
+    payload: dict[str, Any] = {
+        "ok": True,
+        "idle_timeout_seconds": settings.idle_timeout_seconds,
+        "hibernate_configured": bool(settings.hibernate_webhook_url),
+        "worker_pid": os.getpid(),
+    }
+    if model_host is not None:
+        try:
+            host_info = await model_host.ping()
+            payload["resource_plan"] = host_info.pop("resource_plan", None)
+            payload["model_host"] = {"connected": True, **host_info}
+        except Exception as error:
+            payload["ok"] = False
+            payload["model_host"] = {"connected": False, "error": str(error)}
+    else:
+        payload["resource_plan"] = resource_plan.describe()
+    return JSONResponse(payload)
 
 
 @app.post("/api/reflection/trigger")
@@ -1150,7 +1264,30 @@ async def neural_core_socket(websocket: WebSocket) -> None:
                     )
                     continue
 
-                if is_awakening_trigger(incoming):
+                sentiment_profile = sentiment_analysis_v2.analyze(text_prompt)
+                awakening = is_awakening_trigger(incoming)
+
+                if settings.enable_filler_clips and not awakening:
+                    try:
+                        filler = await filler_clips.pick_with_bytes(avatar_path, str(sentiment_profile.get("label")))
+                        if filler is not None:
+                            filler_clip, filler_bytes = filler
+                            await websocket.send_text(
+                                safe_json(
+                                    {
+                                        "type": "video_stream",
+                                        "request_id": request_id,
+                                        "stage": "filler",
+                                        "text": filler_clip.text,
+                                        "video_b64": base64.b64encode(filler_bytes).decode("utf-8"),
+                                        "video_format": filler_clip.video_format,
+                                    }
+                                )
+                            )
+                    except Exception as filler_error:
+                        print("[filler] clip unavailable", repr(filler_error))
+
+                if awakening:
                     try:
                         awakening_bytes, awakening_format = await prepare_awakening_stream(avatar_path)
                         await websocket.send_text(
@@ -1186,7 +1323,6 @@ async def neural_core_socket(websocket: WebSocket) -> None:
                     )
                 )
 
-                sentiment_profile = sentiment_analysis_v2.analyze(text_prompt)
                 await websocket.send_text(
                     safe_json(
                         {
@@ -22,9 +22,10 @@ from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from reflection_engine import run_once as run_reflection_once
+from resource_plan import parse_cores
 from voice_config import VOICE_PARAMS, apply_wit_filter
 from wav2lip_integration import EnterpriseLipSyncService, Wav2LipConfig
-from webrtc_streaming import MARZVideoPresenceService, StreamConfig
+from webrtc_streaming import MARZVideoPresenceService, StreamConfig, WebRTCVideoStreamer
 
 
 class Settings(BaseSettings):
@@ -38,6 +39,15 @@ class Settings(BaseSettings):
     sovereign_voice_sample: str | None = None
     wav2lip_checkpoint_path: str = "/opt/Wav2Lip/checkpoints/wav2lip_gan.pth"
     wav2lip_repo_path: str = "/opt/Wav2Lip"
+    avatar_cache_dir: str = "/workspace/neural-core/data/avatars"
+    lipsync_cpu_cores: str = ""
+    lipsync_threads: int = 0
+    lipsync_max_render_memory_mb: int = 4096
+    render_cache_dir: str = "/workspace/neural-core/data/render-cache"
+    render_cache_max_mb: int = 2048
+    lipsync_profile_sample_rate: float = 0.0
+    lipsync_inference_backend: str = "eager"
+    lipsync_exported_model_path: str = ""
     default_avatar_video: str = "/workspace/neural-core/assets/marz-face.mp4"
     constitution_path: str = "/workspace/neural-core/constitution.md"
     vector_store_path: str = "/workspace/neural-core/data/chroma"
@@ -51,6 +61,12 @@ class Settings(BaseSettings):
     hibernate_signal_name: str = "Hibernate"
     hibernate_cooldown_seconds: int = 600
     enable_webrtc_streaming: bool = True
+    # RTP/UDP media socket shared by all WebRTC streams; the offer advertises
+    # webrtc_public_host, or the host the client used for the WebSocket when empty.
+    webrtc_media_host: str = "0.0.0.0"
+    webrtc_media_port: int = 5004
+    webrtc_public_host: str = ""
+    webrtc_hello_timeout_seconds: float = 30.0
     target_latency_ms: int = 200
     max_latency_ms: int = 500
 
@@ -70,6 +86,7 @@ class GatewayRequest(BaseModel):
     enable_video: bool = True
     enable_webrtc: bool = False
     client_id: str | None = None
+    profile: bool | None = None
 
 
 class ActivityTracker:
@@ -253,12 +270,31 @@ async def initialize_enterprise_services():
     config = Wav2LipConfig(
         checkpoint_path=settings.wav2lip_checkpoint_path,
         repo_path=settings.wav2lip_repo_path,
+        inference_backend=settings.lipsync_inference_backend,
+        exported_model_path=settings.lipsync_exported_model_path or None,
         enable_gpu_acceleration=True,
+        avatar_cache_dir=settings.avatar_cache_dir or None,
+        cpu_cores=tuple(parse_cores(settings.lipsync_cpu_cores)),
+        cpu_threads=settings.lipsync_threads,
+        max_render_memory_mb=settings.lipsync_max_render_memory_mb,
+        render_cache_dir=settings.render_cache_dir or None,
+        render_cache_max_mb=settings.render_cache_max_mb,
+        profile_sample_rate=settings.lipsync_profile_sample_rate,
     )
     lipsync_service = EnterpriseLipSyncService(config)
     await lipsync_service.initialize()
+    default_avatar = Path(settings.default_avatar_video)
+    if default_avatar.exists():
+        try:
+            await lipsync_service.register_avatar(default_avatar)
+        except Exception as e:
+            print(f"[lipsync] Avatar pre-decode failed: {e}")
     
-    video_service = MARZVideoPresenceService(StreamConfig())
+    video_service = MARZVideoPresenceService(
+        StreamConfig(),
+        media_host=settings.webrtc_media_host if settings.enable_webrtc_streaming else None,
+        media_port=settings.webrtc_media_port,
+    )
     await video_service.initialize()
     
     brain = BrainEngine()
@@ -423,21 +459,39 @@ async def neural_core_socket(websocket: WebSocket):
 
                     lipsync_time = 0.0
                     latency_metrics = None
+                    playout = None
+                    # With a connected media stream, frames and voice are played out over
+                    # RTP/UDP as they render instead of returned as an mp4.
+                    streamer = (
+                        video_service.get_stream(incoming.client_id)
+                        if video_service and incoming.enable_webrtc and incoming.client_id
+                        else None
+                    )
+                    media_streamed = streamer is not None and streamer.media_connected
                     
                     if incoming.enable_video and lipsync_service and avatar_path.exists():
                         await websocket.send_text(json.dumps({
                             "type": "status",
                             "request_id": request_id,
-                            "stage": "lipsync_rendering",
+                            "stage": "lipsync_streaming" if media_streamed else "lipsync_rendering",
                             "timestamp_ms": time.time() * 1000,
                         }))
 
                         lipsync_start = time.time()
                         try:
-                            latency_metrics = await lipsync_service.render(avatar_path, wav_path, video_path)
+                            if media_streamed:
+                                latency_metrics, playout = await lipsync_service.render_to_stream(
+                                    avatar_path, wav_path, streamer
+                                )
+                            else:
+                                latency_metrics = await lipsync_service.render(
+                                    avatar_path, wav_path, video_path, profile=incoming.profile
+                                )
                         except Exception as e:
                             latency_metrics = {"error": str(e)}
                         lipsync_time = (time.time() - lipsync_start) * 1000
+                    else:
+                        media_streamed = False
 
                     audio_bytes = wav_path.read_bytes()
                     video_bytes = video_path.read_bytes() if video_path.exists() else b""
@@ -451,6 +505,7 @@ async def neural_core_socket(websocket: WebSocket):
                         "video_b64": base64.b64encode(video_bytes).decode("utf-8") if video_bytes else "",
                         "audio_format": "wav",
                         "video_format": "mp4",
+                        "media_streamed": media_streamed,
                         "performance_metrics": {
                             "total_time_ms": total_time,
                             "brain_time_ms": brain_time,
@@ -458,6 +513,7 @@ async def neural_core_socket(websocket: WebSocket):
                             "lipsync_time_ms": lipsync_time,
                             "latency_metrics": latency_metrics.__dict__ if hasattr(latency_metrics, '__dict__') else latency_metrics,
                             "target_latency_met": total_time <= settings.max_latency_ms,
+                            "playout": playout,
                         },
                     }))
 
@@ -482,6 +538,22 @@ async def neural_core_socket(websocket: WebSocket):
             pass
 
 
+async def announce_media_connected(websocket: WebSocket, streamer: WebRTCVideoStreamer):
+    if await streamer.wait_media(settings.webrtc_hello_timeout_seconds):
+        await websocket.send_text(json.dumps({"type": "media_connected", "peer": list(streamer.peer)}))
+    else:
+        await websocket.send_text(json.dumps({"type": "error", "message": "No media hello received"}))
+
+
+async def run_media_test(websocket: WebSocket, streamer: WebRTCVideoStreamer, seconds: float):
+    playout = await streamer.play_test_pattern(seconds)
+    await websocket.send_text(json.dumps({
+        "type": "media_test_done",
+        "playout": playout,
+        "stream": streamer.get_stats(),
+    }))
+
+
 @app.websocket("/ws/webrtc/{client_id}")
 async def webrtc_streaming_socket(websocket: WebSocket, client_id: str):
     if not video_service:
@@ -489,15 +561,23 @@ async def webrtc_streaming_socket(websocket: WebSocket, client_id: str):
         return
     
     await websocket.accept()
+    tasks: list[asyncio.Task] = []
+    streamer: WebRTCVideoStreamer | None = None
     
     try:
         streamer = await video_service.create_stream_for_client(client_id)
         
-        await websocket.send_text(json.dumps({
+        connected = {
             "type": "webrtc_connected",
             "client_id": client_id,
             "stream_id": streamer.stream_id,
-        }))
+        }
+        if streamer.transport is not None:
+            # Signaling: the client sends a hello datagram with this ssrc and token to
+            # host:port, then receives RTP video/audio and acks each frame on the same socket.
+            connected["media"] = streamer.media_offer(settings.webrtc_public_host or websocket.url.hostname)
+            tasks.append(asyncio.create_task(announce_media_connected(websocket, streamer)))
+        await websocket.send_text(json.dumps(connected))
         
         while True:
             raw = await websocket.receive_text()
@@ -509,17 +589,32 @@ async def webrtc_streaming_socket(websocket: WebSocket, client_id: str):
                     "type": "metrics",
                     "latency_ms": metrics.average_latency_ms,
                     "quality": metrics.connection_quality,
+                    "p95_latency_ms": metrics.p95_latency_ms,
+                    "jitter_ms": metrics.jitter_ms,
+                    "packet_loss_percent": metrics.packet_loss_percent,
+                    "frames_acked": metrics.frames_acked,
+                    "tier": streamer.tier.name,
                 }))
+            elif data.get("type") == "media_test":
+                if not streamer.media_connected:
+                    await websocket.send_text(json.dumps({"type": "error", "message": "Media not connected"}))
+                else:
+                    seconds = min(30.0, float(data.get("seconds", 3.0)))
+                    tasks.append(asyncio.create_task(run_media_test(websocket, streamer, seconds)))
             elif data.get("type") == "disconnect":
                 break
         
-        await video_service.remove_client(client_id)
+        await video_service.remove_client(client_id, streamer)
     except WebSocketDisconnect:
-        if video_service:
-            await video_service.remove_client(client_id)
+        # Only this socket's stream: the client may already have reconnected with a new one.
+        if video_service and streamer is not None:
+            await video_service.remove_client(client_id, streamer)
     except Exception as e:
         await websocket.send_text(json.dumps({"type": "error", "message": str(e)}))
         await websocket.close(code=1011)
+    finally:
+        for task in tasks:
+            task.cancel()
 
 
 @app.post("/orchestrator/hibernate")
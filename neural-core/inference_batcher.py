@@ -0,0 +1,201 @@
+"""
+Cross-request batching for the Wav2Lip generator.
+
+One dedicated thread owns the model. Renders submit (face crop, mel window)
+chunks and get a future back; the thread packs chunks from every active
+render into shared batches, highest priority first and FIFO within a
+priority, runs one forward pass per batch and scatters the generated faces
+back to each chunk's output buffer.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import numpy as np
+import torch
+
+from resource_plan import StagePlan, pin_current_thread
+
+
+@dataclass
+class _Chunk:
+    faces: np.ndarray
+    mels: np.ndarray
+    future: Future
+    output: np.ndarray
+    taken: int = 0
+    done: int = 0
+
+
+@dataclass(order=True)
+class _QueueEntry:
+    sort_key: tuple[int, int]
+    chunk: _Chunk = field(compare=False)
+
+
+class InferenceBatcher:
+    """Dedicated model thread that batches work from all concurrent renders"""
+
+    def __init__(
+        self,
+        model: Any,
+        device: str,
+        batch_size: int,
+        face_resolution: tuple[int, int],
+        plan: StagePlan,
+        batch_wait_ms: float = 4.0,
+    ):
+        self.model = model
+        self.device = device
+        self.batch_size = max(1, batch_size)
+        self.face_resolution = face_resolution
+        self.plan = plan
+        self.batch_wait_s = max(0.0, batch_wait_ms) / 1000.0
+        self._queue: list[_QueueEntry] = []
+        self._queued_rows = 0
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.perf_counter()
+
+    def start(self) -> "InferenceBatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="marz-lipsync-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, faces: np.ndarray, mels: np.ndarray, priority: int = 0) -> Future:
+        """Queue (N, H, W, 3) RGB faces with their (N, 80, 16) mel windows; resolves to (N, H, W, 3) uint8"""
+        future: Future = Future()
+        if len(faces) == 0:
+            future.set_result(np.empty_like(faces))
+            return future
+        chunk = _Chunk(faces=faces, mels=mels, future=future, output=np.empty_like(faces))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Inference batcher is shut down")
+            heapq.heappush(self._queue, _QueueEntry((-priority, next(self._sequence)), chunk))
+            self._queued_rows += len(faces)
+            self._cond.notify()
+        return future
+
+    def _take_batch(self) -> Optional[list[tuple[_Chunk, int, int]]]:
+        """Block until work is queued, briefly wait for a fuller batch, then pop up to batch_size rows"""
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            deadline = time.monotonic() + self.batch_wait_s
+            while self._queued_rows < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch: list[tuple[_Chunk, int, int]] = []
+            filled = 0
+            while self._queue and filled < self.batch_size:
+                entry = self._queue[0]
+                chunk = entry.chunk
+                take = min(len(chunk.faces) - chunk.taken, self.batch_size - filled)
+                batch.append((chunk, chunk.taken, take))
+                chunk.taken += take
+                filled += take
+                if chunk.taken == len(chunk.faces):
+                    heapq.heappop(self._queue)
+            self._queued_rows -= filled
+            return batch
+
+    def _loop(self) -> None:
+        pin_current_thread(self.plan.cores)
+        width, height = self.face_resolution
+        on_cuda = str(self.device).startswith("cuda")
+        face_host = torch.empty((self.batch_size, 6, height, width), dtype=torch.float32, pin_memory=on_cuda)
+        face_input = torch.empty_like(face_host, device=self.device) if on_cuda else face_host
+        # Mel staging is sized from the first chunk's window shape.
+        mel_host: Optional[torch.Tensor] = None
+        mel_input: Optional[torch.Tensor] = None
+
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                if mel_host is None:
+                    mel_shape = (self.batch_size, 1) + tuple(batch[0][0].mels.shape[1:])
+                    mel_host = torch.empty(mel_shape, dtype=torch.float32, pin_memory=on_cuda)
+                    mel_input = torch.empty_like(mel_host, device=self.device) if on_cuda else mel_host
+                filled = 0
+                for chunk, offset, take in batch:
+                    faces = torch.from_numpy(chunk.faces[offset:offset + take]).permute(0, 3, 1, 2)
+                    # Masked face (lower half zeroed) stacked with the unmasked reference,
+                    # both BGR in [0, 1] as the model was trained on.
+                    face_host[filled:filled + take, 3:].copy_(faces.flip(1))
+                    mel_host[filled:filled + take, 0].copy_(torch.from_numpy(chunk.mels[offset:offset + take]))
+                    filled += take
+                reference = face_host[:filled, 3:]
+                reference.div_(255.0)
+                face_host[:filled, :3].copy_(reference)
+                face_host[:filled, :3, height // 2:] = 0
+
+                if on_cuda:
+                    face_input[:filled].copy_(face_host[:filled], non_blocking=True)
+                    mel_input[:filled].copy_(mel_host[:filled], non_blocking=True)
+
+                with torch.no_grad():
+                    output = self.model(mel_input[:filled], face_input[:filled])
+                generated = (
+                    output.flip(1).permute(0, 2, 3, 1).mul(255.0).clamp_(0, 255).to(torch.uint8).cpu().numpy()
+                )
+            except Exception as error:
+                self._fail([chunk for chunk, _, _ in batch], error)
+                continue
+
+            position = 0
+            for chunk, offset, take in batch:
+                chunk.output[offset:offset + take] = generated[position:position + take]
+                position += take
+                chunk.done += take
+                if chunk.done == len(chunk.faces):
+                    chunk.future.set_result(chunk.output)
+            self.batches += 1
+            self.rows += filled
+            self.busy_seconds += time.perf_counter() - started
+
+    def _fail(self, chunks: list[_Chunk], error: Exception) -> None:
+        with self._cond:
+            failed_ids = {id(chunk) for chunk in chunks}
+            remaining = [entry for entry in self._queue if id(entry.chunk) not in failed_ids]
+            self._queued_rows = sum(len(e.chunk.faces) - e.chunk.taken for e in remaining)
+            self._queue = remaining
+            heapq.heapify(self._queue)
+        for chunk in chunks:
+            if not chunk.future.done():
+                chunk.future.set_exception(error)
+
+    def stats(self) -> dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "batches": self.batches,
+            "frames": self.rows,
+            "average_batch_fill": self.rows / (self.batches * self.batch_size) if self.batches else 0.0,
+            "queued_frames": self._queued_rows,
+            "busy_fraction": self.busy_seconds / elapsed if elapsed > 0 else 0.0,
+            "frames_per_second_busy": self.rows / self.busy_seconds if self.busy_seconds > 0 else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,229 @@
+"""
+Low-latency media transport for MARZ video presence.
+
+RTP-style packets over one shared UDP socket. The sender fragments JPEG video
+frames to fit the MTU and sends audio as 20 ms L16 PCM packets. Each stream
+is identified by its SSRC. A receiver first sends a hello datagram carrying
+the SSRC and the token from the signaling offer, so the server learns its
+address. It then acks every video frame it completes, and the acks feed the
+stream's LatencyMonitor.
+
+Packet header (12 bytes, network order, RTP layout):
+    V=2 | M + payload type | sequence | timestamp | SSRC
+Video payloads add frame_id (u32), fragment index (u16), fragment count (u16).
+"""
+
+import asyncio
+import random
+import struct
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+RTP_VERSION = 2
+PT_PCM = 11   # L16 mono, sample-rate clock
+PT_JPEG = 26  # JPEG, 90 kHz clock
+PT_HELLO = 100
+PT_ACK = 101
+VIDEO_CLOCK_HZ = 90000
+MAX_PAYLOAD_BYTES = 1200
+AUDIO_PACKET_MS = 20
+
+_HEADER = struct.Struct("!BBHII")
+_FRAGMENT = struct.Struct("!IHH")
+_ACK = struct.Struct("!I")
+# Incomplete frames this far behind the newest completed one are abandoned.
+_REASSEMBLY_WINDOW = 8
+
+
+def pack_header(payload_type: int, sequence: int, timestamp: int, ssrc: int, marker: bool = False) -> bytes:
+    return _HEADER.pack(
+        RTP_VERSION << 6,
+        (0x80 if marker else 0) | payload_type,
+        sequence & 0xFFFF,
+        timestamp & 0xFFFFFFFF,
+        ssrc,
+    )
+
+
+def parse_header(data: bytes) -> Optional[tuple[int, bool, int, int, int, memoryview]]:
+    """(payload_type, marker, sequence, timestamp, ssrc, payload), or None for foreign datagrams"""
+    if len(data) < _HEADER.size:
+        return None
+    first, second, sequence, timestamp, ssrc = _HEADER.unpack_from(data)
+    if first >> 6 != RTP_VERSION:
+        return None
+    return second & 0x7F, bool(second & 0x80), sequence, timestamp, ssrc, memoryview(data)[_HEADER.size:]
+
+
+def packetize_frame(jpeg: bytes, frame_id: int, first_sequence: int, timestamp: int, ssrc: int) -> list[bytes]:
+    """Split one JPEG frame into MTU-sized packets; the last one carries the marker bit"""
+    chunk = MAX_PAYLOAD_BYTES - _FRAGMENT.size
+    count = max(1, -(-len(jpeg) // chunk))
+    packets = []
+    for index in range(count):
+        header = pack_header(PT_JPEG, first_sequence + index, timestamp, ssrc, marker=index == count - 1)
+        packets.append(header + _FRAGMENT.pack(frame_id, index, count) + jpeg[index * chunk:(index + 1) * chunk])
+    return packets
+
+
+def packetize_audio(
+    samples: np.ndarray,
+    first_sequence: int,
+    first_sample: int,
+    sample_rate: int,
+    ssrc: int,
+) -> list[bytes]:
+    """Split mono int16 samples into AUDIO_PACKET_MS L16 packets"""
+    per_packet = sample_rate * AUDIO_PACKET_MS // 1000
+    payload = samples.astype(">i2", copy=False)
+    packets = []
+    for index, start in enumerate(range(0, len(payload), per_packet)):
+        header = pack_header(PT_PCM, first_sequence + index, first_sample + start, ssrc)
+        packets.append(header + payload[start:start + per_packet].tobytes())
+    return packets
+
+
+def hello_packet(ssrc: int, token: str) -> bytes:
+    return pack_header(PT_HELLO, 0, 0, ssrc) + token.encode("ascii")
+
+
+def ack_packet(ssrc: int, frame_id: int) -> bytes:
+    return pack_header(PT_ACK, 0, 0, ssrc) + _ACK.pack(frame_id)
+
+
+class MediaTransport(asyncio.DatagramProtocol):
+    """Server side: one UDP socket shared by every stream, demultiplexed by SSRC"""
+
+    def __init__(self):
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._streams: dict[int, Any] = {}
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.packets_received = 0
+        self.unknown_packets = 0
+
+    async def start(self, host: str, port: int) -> tuple[str, int]:
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        return self.address
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.transport.get_extra_info("sockname")[:2]
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def register(self, stream: Any) -> int:
+        """Allocate an unused SSRC for a stream with on_hello(token, addr) and on_ack(frame_id)"""
+        ssrc = random.getrandbits(32)
+        while ssrc in self._streams:
+            ssrc = random.getrandbits(32)
+        self._streams[ssrc] = stream
+        return ssrc
+
+    def unregister(self, ssrc: int) -> None:
+        self._streams.pop(ssrc, None)
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.packets_received += 1
+        parsed = parse_header(data)
+        stream = self._streams.get(parsed[4]) if parsed is not None else None
+        if stream is None:
+            self.unknown_packets += 1
+            return
+        payload_type, _, _, _, _, payload = parsed
+        if payload_type == PT_HELLO:
+            stream.on_hello(bytes(payload).decode("ascii", errors="ignore"), addr)
+        elif payload_type == PT_ACK and len(payload) >= _ACK.size:
+            stream.on_ack(_ACK.unpack_from(payload)[0])
+
+    def send(self, packets: list[bytes], addr: tuple[str, int]) -> None:
+        for packet in packets:
+            self.transport.sendto(packet, addr)
+            self.bytes_sent += len(packet)
+        self.packets_sent += len(packets)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "address": list(self.address) if self.transport is not None else None,
+            "streams": len(self._streams),
+            "packets_sent": self.packets_sent,
+            "bytes_sent": self.bytes_sent,
+            "packets_received": self.packets_received,
+            "unknown_packets": self.unknown_packets,
+        }
+
+
+class MediaReceiver(asyncio.DatagramProtocol):
+    """
+    Client side: says hello, reassembles video frames, acks each completed frame at once
+    and collects audio. Used by verify_media_loopback.py; a browser or native client
+    implements the same packet format.
+    """
+
+    def __init__(self, ssrc: int, token: str, on_frame: Optional[Callable[[int, int, bytes], None]] = None):
+        self.ssrc = ssrc
+        self.token = token
+        self.on_frame = on_frame
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        self._fragments: dict[int, list[Optional[bytes]]] = {}
+        self._newest_complete = -1
+        self.frames_completed = 0
+        self.frames_abandoned = 0
+        self.video_bytes = 0
+        self.audio_packets = 0
+        self.audio_samples: list[np.ndarray] = []
+        self.first_packet = asyncio.Event()
+
+    async def connect(self, host: str, port: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: self, remote_addr=(host, port))
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def hello(self) -> None:
+        self.transport.sendto(hello_packet(self.ssrc, self.token))
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        parsed = parse_header(data)
+        if parsed is None or parsed[4] != self.ssrc:
+            return
+        self.first_packet.set()
+        payload_type, _, _, timestamp, _, payload = parsed
+        if payload_type == PT_PCM:
+            self.audio_packets += 1
+            self.audio_samples.append(np.frombuffer(payload, dtype=">i2").astype(np.int16))
+        elif payload_type == PT_JPEG and len(payload) >= _FRAGMENT.size:
+            frame_id, index, count = _FRAGMENT.unpack_from(payload)
+            self._add_fragment(frame_id, index, count, timestamp, bytes(payload[_FRAGMENT.size:]))
+
+    def _add_fragment(self, frame_id: int, index: int, count: int, timestamp: int, chunk: bytes) -> None:
+        if frame_id <= self._newest_complete - _REASSEMBLY_WINDOW or index >= count:
+            return
+        fragments = self._fragments.setdefault(frame_id, [None] * count)
+        fragments[index] = chunk
+        if any(part is None for part in fragments):
+            return
+        del self._fragments[frame_id]
+        self.transport.sendto(ack_packet(self.ssrc, frame_id))
+        jpeg = b"".join(fragments)
+        self.frames_completed += 1
+        self.video_bytes += len(jpeg)
+        self._newest_complete = max(self._newest_complete, frame_id)
+        for stale in [f for f in self._fragments if f <= self._newest_complete - _REASSEMBLY_WINDOW]:
+            del self._fragments[stale]
+            self.frames_abandoned += 1
+        if self.on_frame is not None:
+            self.on_frame(frame_id, timestamp, jpeg)
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
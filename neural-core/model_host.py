@@ -0,0 +1,227 @@
+"""
+MARZ Neural Core shared model host.
+
+One process owns the brain (LLM), voice (TTS) and lip-sync engines and serves
+them to any number of uvicorn workers over a local Unix domain socket, so the
+model weights are loaded once per machine instead of once per worker.
+
+Usage: MODEL_HOST_SOCKET=/tmp/marz-model-host.sock python model_host.py
+"""
+
+import asyncio
+import json
+import os
+import traceback
+from pathlib import Path
+from typing import Any, Callable
+
+# Payloads are prompts, short texts and file paths; audio and video are exchanged
+# through the shared filesystem, never over the socket.
+MAX_MESSAGE_BYTES = 4 * 1024 * 1024
+DEFAULT_SOCKET_PATH = "/tmp/marz-model-host.sock"
+
+
+class ModelHostError(RuntimeError):
+    pass
+
+
+async def _read_message(reader: asyncio.StreamReader) -> dict[str, Any] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    payload = json.loads(line.decode("utf-8"))
+    if not isinstance(payload, dict):
+        raise ValueError("Model host message must be a JSON object.")
+    return payload
+
+
+async def _write_message(writer: asyncio.StreamWriter, payload: dict[str, Any]) -> None:
+    writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+    await writer.drain()
+
+
+class ModelHostServer:
+    def __init__(
+        self,
+        socket_path: str,
+        brain: Any,
+        voice: Any,
+        lipsync: Any,
+        on_error: Callable[[BaseException], None] | None = None,
+        describe: Callable[[], dict[str, Any]] | None = None,
+    ) -> None:
+        self.socket_path = socket_path
+        self.brain = brain
+        self.voice = voice
+        self.lipsync = lipsync
+        self._on_error = on_error
+        self._describe = describe
+        self._active_requests = 0
+        self._served_requests = 0
+
+    async def _dispatch(self, op: str, args: dict[str, Any]) -> Any:
+        if op == "ping":
+            info: dict[str, Any] = {
+                "pid": os.getpid(),
+                "active_requests": self._active_requests,
+                "served_requests": self._served_requests,
+            }
+            if self._describe is not None:
+                info.update(self._describe())
+            return info
+        if op == "brain.infer":
+            return await self.brain.infer(str(args["prompt"]), sentiment_profile=args.get("sentiment_profile"))
+        if op == "voice.synthesize":
+            await self.voice.synthesize(str(args["text"]), Path(args["out_wav"]))
+            return None
+        if op == "lipsync.render":
+            await self.lipsync.render(Path(args["face_video"]), Path(args["audio_wav"]), Path(args["out_mp4"]))
+            return None
+        raise ValueError(f"Unknown model host operation: {op}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    message = await _read_message(reader)
+                except (ValueError, json.JSONDecodeError) as error:
+                    await _write_message(writer, {"ok": False, "error_type": "ValueError", "error": str(error)})
+                    break
+                if message is None:
+                    break
+
+                op = str(message.get("op") or "")
+                args = message.get("args") or {}
+                self._active_requests += 1
+                try:
+                    result = await self._dispatch(op, args)
+                    response = {"ok": True, "result": result}
+                except Exception as error:
+                    print(f"[model-host] {op} failed", repr(error))
+                    traceback.print_exc()
+                    if self._on_error is not None:
+                        try:
+                            self._on_error(error)
+                        except Exception:
+                            pass
+                    response = {"ok": False, "error_type": type(error).__name__, "error": str(error)}
+                finally:
+                    self._active_requests -= 1
+                    self._served_requests += 1
+
+                await _write_message(writer, response)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def serve_forever(self) -> None:
+        socket_file = Path(self.socket_path)
+        socket_file.parent.mkdir(parents=True, exist_ok=True)
+        if socket_file.exists():
+            socket_file.unlink()
+
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path, limit=MAX_MESSAGE_BYTES)
+        os.chmod(self.socket_path, 0o600)
+        print(f"[model-host] serving on {self.socket_path} (pid {os.getpid()})")
+        async with server:
+            await server.serve_forever()
+
+
+class ModelHostClient:
+    """Connects to a ModelHostServer; one short-lived connection per call."""
+
+    def __init__(self, socket_path: str, connect_timeout_seconds: float = 5.0) -> None:
+        self.socket_path = socket_path
+        self.connect_timeout_seconds = connect_timeout_seconds
+
+    async def call(self, op: str, **args: Any) -> Any:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(self.socket_path, limit=MAX_MESSAGE_BYTES),
+            timeout=self.connect_timeout_seconds,
+        )
+        try:
+            await _write_message(writer, {"op": op, "args": args})
+            response = await _read_message(reader)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+        if response is None:
+            raise ModelHostError(f"Model host closed the connection during {op}.")
+        if not response.get("ok"):
+            raise ModelHostError(f"{response.get('error_type', 'Error')}: {response.get('error', '')}")
+        return response.get("result")
+
+    async def ping(self) -> dict[str, Any]:
+        return await self.call("ping")
+
+
+class RemoteBrainEngine:
+    def __init__(self, client: ModelHostClient) -> None:
+        self._client = client
+
+    async def infer(self, prompt: str, sentiment_profile: dict[str, Any] | None = None) -> str:
+        return str(await self._client.call("brain.infer", prompt=prompt, sentiment_profile=sentiment_profile))
+
+
+class RemoteSovereignVoice:
+    def __init__(self, client: ModelHostClient) -> None:
+        self._client = client
+
+    async def synthesize(self, text: str, out_wav: Path) -> None:
+        await self._client.call("voice.synthesize", text=text, out_wav=str(out_wav))
+
+
+class RemoteLipSyncEngine:
+    def __init__(self, client: ModelHostClient) -> None:
+        self._client = client
+
+    async def render(self, face_video: Path, audio_wav: Path, out_mp4: Path) -> None:
+        await self._client.call(
+            "lipsync.render",
+            face_video=str(face_video),
+            audio_wav=str(audio_wav),
+            out_mp4=str(out_mp4),
+        )
+
+
+def main() -> None:
+    # Imported here so gateway workers can import this module without pulling
+    # the engines in twice.
+    import gateway
+
+    socket_path = gateway.settings.model_host_socket or DEFAULT_SOCKET_PATH
+
+    def _recover(error: BaseException) -> None:
+        if gateway.is_cuda_oom(error):
+            gateway.clear_cuda_cache("model_host_oom")
+
+    server = ModelHostServer(
+        socket_path,
+        brain=gateway.BrainEngine(),
+        voice=gateway.SovereignVoice(),
+        lipsync=gateway.LipSyncEngine(),
+        on_error=_recover,
+        describe=lambda: {"resource_plan": gateway.resource_plan.describe()},
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        try:
+            Path(socket_path).unlink()
+        except Exception:
+            pass
+
+
+if __name__ == "__main__":
+    main()
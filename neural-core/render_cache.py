@@ -0,0 +1,170 @@
+"""
+Content-addressed on-disk cache of rendered lip-sync videos.
+
+Entries are keyed by the SHA-256 of the avatar video, the audio and the
+render configuration, so identical inputs hit regardless of the temp paths
+they arrive under. The cache holds at most `max_bytes` of MP4s and evicts
+least recently used entries; concurrent requests for the same key render
+once and share the result.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+from avatar_store import file_digest
+
+T = TypeVar("T")
+
+_ENTRY_SUFFIX = ".mp4"
+
+
+class RenderCache:
+    """Byte-budgeted LRU of rendered videos with single-flight fills"""
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max(0, max_bytes)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(avatar_path: Path, audio_path: Path, config: dict[str, Any]) -> str:
+        hasher = hashlib.sha256()
+        hasher.update(file_digest(avatar_path).encode("ascii"))
+        hasher.update(file_digest(audio_path, memoize=False).encode("ascii"))
+        hasher.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{_ENTRY_SUFFIX}"
+
+    def _load(self) -> None:
+        """Rebuild the index from disk, oldest access first"""
+        if self._loaded:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.cache_dir.glob(f"*{_ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.name[: -len(_ENTRY_SUFFIX)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        self._loaded = True
+        self._evict_over_budget()
+
+    def _evict_over_budget(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._path(key).unlink(missing_ok=True)
+
+    def lookup(self, key: str, output_path: Path) -> bool:
+        """Copy a cached entry to output_path; returns False on a miss"""
+        with self._lock:
+            self._load()
+            if key not in self._entries:
+                return False
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, output_path)
+            # mtime carries recency across restarts.
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+            return False
+        return True
+
+    def store(self, key: str, rendered_path: Path) -> None:
+        size = rendered_path.stat().st_size
+        if size > self.max_bytes:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(rendered_path, tmp_path)
+        with self._lock:
+            self._load()
+            tmp_path.replace(path)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous
+            self._entries[key] = size
+            self._bytes += size
+            self._evict_over_budget()
+
+    async def get_or_render(
+        self,
+        key: str,
+        output_path: Path,
+        render: Callable[[], Awaitable[T]],
+        succeeded: Callable[[T], bool],
+    ) -> Optional[T]:
+        """Serve output_path from the cache or render it once per key; None means a cache hit"""
+        while True:
+            if await asyncio.to_thread(self.lookup, key, output_path):
+                self.hits += 1
+                return None
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            # An identical render is already running: wait for it, then retry the lookup.
+            self.coalesced += 1
+            await asyncio.shield(pending)
+
+        self.misses += 1
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await render()
+            if succeeded(result) and output_path.exists():
+                await asyncio.to_thread(self.store, key, output_path)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._load()
+            for key in list(self._entries):
+                self._path(key).unlink(missing_ok=True)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._load()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,81 @@
+"""
+Opt-in per-render profiling for the Wav2Lip pipeline.
+
+A RenderProfile is created for renders that ask for it (or are sampled) and
+is threaded through the hot path. It only adds counters and perf_counter
+reads, so a profiled render runs at production speed. The summary tells
+where a slow render spent its time: frames/sec per phase, generator batch
+latency, bytes through the ffmpeg pipes and time blocked on them, and
+process peak RSS.
+"""
+
+import resource
+import sys
+from typing import Any
+
+_MB = 1024 * 1024
+
+
+def _max_rss_bytes() -> int:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RenderProfile:
+    """Hot-path counters for one render"""
+
+    def __init__(self):
+        self.phases: dict[str, dict[str, float]] = {}
+        self.batches = 0
+        self.batch_frames = 0
+        self.batch_seconds_total = 0.0
+        self.batch_seconds_max = 0.0
+        self.batch_wait_seconds = 0.0
+        self.bytes_decoded = 0
+        self.bytes_encoded = 0
+        self.output_bytes = 0
+        self.pipe_blocked_seconds: dict[str, float] = {}
+        self._rss_start = _max_rss_bytes()
+
+    def phase(self, name: str, seconds: float, frames: int) -> None:
+        self.phases[name] = {
+            "time_ms": seconds * 1000,
+            "frames": frames,
+            "fps": frames / seconds if seconds > 0 else 0.0,
+        }
+
+    def batch(self, latency_seconds: float, wait_seconds: float, frames: int) -> None:
+        """One generator chunk: submit-to-result latency and time this render blocked on it"""
+        self.batches += 1
+        self.batch_frames += frames
+        self.batch_seconds_total += latency_seconds
+        self.batch_seconds_max = max(self.batch_seconds_max, latency_seconds)
+        self.batch_wait_seconds += wait_seconds
+
+    def pipe(self, name: str, nbytes: int, blocked_seconds: float, encoded: bool = False) -> None:
+        if encoded:
+            self.bytes_encoded += nbytes
+        else:
+            self.bytes_decoded += nbytes
+        self.pipe_blocked_seconds[name] = self.pipe_blocked_seconds.get(name, 0.0) + blocked_seconds
+
+    def as_dict(self) -> dict[str, Any]:
+        peak = _max_rss_bytes()
+        return {
+            "phases": self.phases,
+            "batches": {
+                "count": self.batches,
+                "frames": self.batch_frames,
+                "mean_ms": self.batch_seconds_total / self.batches * 1000 if self.batches else 0.0,
+                "max_ms": self.batch_seconds_max * 1000,
+                "blocked_ms": self.batch_wait_seconds * 1000,
+            },
+            "bytes_decoded": self.bytes_decoded,
+            "bytes_encoded": self.bytes_encoded,
+            "output_bytes": self.output_bytes,
+            "pipe_blocked_ms": {name: seconds * 1000 for name, seconds in self.pipe_blocked_seconds.items()},
+            # Process-wide high-water mark; growth is how far this render raised it.
+            "peak_rss_mb": peak / _MB,
+            "peak_rss_growth_mb": max(0, peak - self._rss_start) / _MB,
+        }
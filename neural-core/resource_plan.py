@@ -0,0 +1,247 @@
+"""
+CPU core partitioning for the brain, TTS and lip-sync stages.
+
+Each stage gets its own core set and intra-op thread count. Blocking stage work
+runs on a dedicated executor whose threads pin themselves to the stage's cores;
+OpenMP teams spawned from those threads inherit the affinity. torch and OpenCV
+thread counts are process-wide, so they are set once per process, sized for the
+largest stage running in it. Worker processes (TTS pool, Wav2Lip subprocess)
+are pinned with the same core sets and set their own thread counts.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+STAGES = ("brain", "tts", "lipsync")
+# Share of available cores per stage when no explicit core list is configured.
+# TTS is the dominant CPU stage on GPU-less nodes.
+AUTO_SPLIT_WEIGHTS = {"brain": 0.3, "tts": 0.4, "lipsync": 0.3}
+# Same bound as the default executor behind asyncio.to_thread, so moving a stage onto
+# its own pool does not lower how many requests it runs at once.
+DEFAULT_STAGE_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+def available_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cores(spec: str) -> list[int]:
+    """Parse a core list such as "0-3,8,10-11" """
+    cores: set[int] = set()
+    for part in (spec or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+
+def format_cores(cores: list[int]) -> str:
+    ranges: list[list[int]] = []
+    for core in sorted(cores):
+        if ranges and ranges[-1][1] == core - 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def pin_current_thread(cores: list[int]) -> dict[str, Any]:
+    """Pin the calling thread to cores; returns the affinity that took effect"""
+    applied: dict[str, Any] = {}
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            # pid 0 addresses the calling thread on Linux.
+            os.sched_setaffinity(0, cores)
+        except OSError as error:
+            applied["affinity_error"] = str(error)
+    if hasattr(os, "sched_getaffinity"):
+        applied["affinity"] = format_cores(sorted(os.sched_getaffinity(0)))
+    return applied
+
+
+def set_process_threads(threads: int) -> dict[str, Any]:
+    """
+    Set torch/OpenCV intra-op thread counts. Both are process-wide, so call this once per
+    process, not from each stage's threads; returns the effective counts.
+    """
+    applied: dict[str, Any] = {}
+    if threads > 0:
+        try:
+            import torch
+
+            torch.set_num_threads(threads)
+            applied["torch_threads"] = torch.get_num_threads()
+        except Exception:
+            pass
+        try:
+            import cv2
+
+            cv2.setNumThreads(threads)
+            applied["opencv_threads"] = cv2.getNumThreads()
+        except Exception:
+            pass
+    return applied
+
+
+def pin_process(pid: int, cores: list[int]) -> None:
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(pid, cores)
+        except OSError:
+            pass
+
+
+def thread_env(threads: int) -> dict[str, str]:
+    """Environment for child processes so their BLAS/OpenMP pools match the stage"""
+    if threads <= 0:
+        return {}
+    value = str(threads)
+    return {"OMP_NUM_THREADS": value, "MKL_NUM_THREADS": value, "OPENBLAS_NUM_THREADS": value}
+
+
+@dataclass
+class StagePlan:
+    name: str
+    cores: list[int]
+    threads: int
+    applied: dict[str, Any] = field(default_factory=dict)
+
+
+class StageExecutor:
+    """Single-purpose thread pool whose threads run pinned to one stage's cores"""
+
+    def __init__(self, plan: StagePlan, max_workers: int = DEFAULT_STAGE_WORKERS):
+        self.plan = plan
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _initialize_thread(self) -> None:
+        self.plan.applied = pin_current_thread(self.plan.cores)
+
+    def _ensure_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"marz-{self.plan.name}",
+                    initializer=self._initialize_thread,
+                )
+            return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ensure_executor(), fn, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+class ResourcePlan:
+    def __init__(
+        self,
+        stages: dict[str, StagePlan],
+        partitioned: bool,
+        local_stages: Iterable[str] = STAGES,
+    ):
+        self.stages = stages
+        self.partitioned = partitioned
+        # Stages whose work runs in this process and shares its torch/OpenCV thread counts.
+        self.local_stages = tuple(local_stages)
+        self.process_threads: dict[str, Any] = {}
+        self._threads_applied = False
+        self._executors: dict[str, StageExecutor] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StagePlan:
+        return self.stages[name]
+
+    def apply_process_threads(self) -> dict[str, Any]:
+        """Set the process-wide thread counts once, for the largest local stage"""
+        with self._lock:
+            if not self._threads_applied:
+                self._threads_applied = True
+                threads = max((self.stages[name].threads for name in self.local_stages), default=0)
+                self.process_threads = set_process_threads(threads)
+        return self.process_threads
+
+    def executor(self, name: str) -> StageExecutor:
+        if name not in self._executors:
+            self.apply_process_threads()
+            self._executors[name] = StageExecutor(self.stages[name])
+        return self._executors[name]
+
+    async def run(self, name: str, fn: Callable[..., T], *args: Any) -> T:
+        return await self.executor(name).run(fn, *args)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "partitioned": self.partitioned,
+            "available_cores": format_cores(available_cores()),
+            "process_threads": dict(self.process_threads),
+            "stages": {
+                name: {
+                    "cores": format_cores(stage.cores),
+                    "threads": stage.threads,
+                    "applied": dict(stage.applied),
+                }
+                for name, stage in self.stages.items()
+            },
+        }
+
+
+def build_plan(
+    core_specs: dict[str, str],
+    thread_counts: dict[str, int],
+    enabled: bool = True,
+    cores: Optional[list[int]] = None,
+    local_stages: Iterable[str] = STAGES,
+) -> ResourcePlan:
+    """Assign each stage a core set; explicit specs win, the rest are split automatically"""
+    cores = cores if cores is not None else available_cores()
+    assigned: dict[str, list[int]] = {}
+
+    if enabled:
+        for name in STAGES:
+            explicit = parse_cores(core_specs.get(name, ""))
+            if explicit:
+                assigned[name] = [core for core in explicit if core in cores] or explicit
+
+        remaining_stages = [name for name in STAGES if name not in assigned]
+        taken = {core for stage_cores in assigned.values() for core in stage_cores}
+        free = [core for core in cores if core not in taken]
+        if remaining_stages and len(free) >= len(remaining_stages):
+            total_weight = sum(AUTO_SPLIT_WEIGHTS[name] for name in remaining_stages)
+            start = 0
+            for index, name in enumerate(remaining_stages):
+                if index == len(remaining_stages) - 1:
+                    count = len(free) - start
+                else:
+                    share = AUTO_SPLIT_WEIGHTS[name] / total_weight
+                    reserve = len(remaining_stages) - index - 1
+                    count = max(1, min(round(len(free) * share), len(free) - start - reserve))
+                assigned[name] = free[start:start + count]
+                start += count
+
+    partitioned = enabled and all(name in assigned for name in STAGES)
+    stages: dict[str, StagePlan] = {}
+    for name in STAGES:
+        stage_cores = assigned.get(name, []) if partitioned else []
+        threads = thread_counts.get(name, 0) or (len(stage_cores) if stage_cores else 0)
+        stages[name] = StagePlan(name=name, cores=stage_cores, threads=threads)
+    return ResourcePlan(stages, partitioned=partitioned, local_stages=local_stages)
@@ -5,4 +5,23 @@ HOST="${HOST:-0.0.0.0}"
 PORT="${PORT:-8080}"
 WORKERS="${UVICORN_WORKERS:-1}"
 
+# With more than one worker, load the models once in a shared model host
+# process instead of once per worker.
+if [ "${WORKERS}" -gt 1 ] && [ -z "${MODEL_HOST_SOCKET:-}" ]; then
+  export MODEL_HOST_SOCKET="/tmp/marz-model-host.sock"
+fi
+
+if [ -n "${MODEL_HOST_SOCKET:-}" ]; then
+  rm -f "${MODEL_HOST_SOCKET}"
+  python model_host.py &
+  for _ in $(seq 1 300); do
+    [ -S "${MODEL_HOST_SOCKET}" ] && break
+    sleep 0.1
+  done
+  if [ ! -S "${MODEL_HOST_SOCKET}" ]; then
+    echo "[start] model host did not come up on ${MODEL_HOST_SOCKET}" >&2
+    exit 1
+  fi
+fi
+
 exec uvicorn gateway:app --host "${HOST}" --port "${PORT}" --workers "${WORKERS}"
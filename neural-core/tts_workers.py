@@ -0,0 +1,209 @@
+"""
+MARZ Sovereign Voice synthesis helpers and multi-process TTS pool.
+
+`synthesize_array` holds the Coqui call logic shared by the in-process voice and
+the pool workers. `TTSProcessPool` keeps one model copy per worker process and
+synthesizes the sentences of a turn in parallel, so concurrent sessions spread
+across cores instead of queueing behind one interpreter.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import soundfile as sf
+
+from resource_plan import pin_current_thread, set_process_threads
+from voice_config import VOICE_PARAMS
+
+DEFAULT_SAMPLE_RATE = 24000
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+")
+_MIN_SENTENCE_CHARS = 24
+
+# Per-process model handle used by pool workers.
+_worker_tts: Any | None = None
+
+
+def split_sentences(text: str, min_chars: int = _MIN_SENTENCE_CHARS) -> list[str]:
+    """Split text on sentence boundaries, folding fragments too short to voice well"""
+    parts = [part.strip() for part in _SENTENCE_BOUNDARY.split(" ".join((text or "").split())) if part.strip()]
+    sentences: list[str] = []
+    for part in parts:
+        if sentences and (len(part) < min_chars or len(sentences[-1]) < min_chars):
+            sentences[-1] = f"{sentences[-1]} {part}"
+        else:
+            sentences.append(part)
+    return sentences
+
+
+def load_tts(model_id: str) -> Any:
+    from TTS.api import TTS
+
+    def _force_cpu_float32(model: Any) -> None:
+        try:
+            import torch
+
+            if hasattr(model, "to"):
+                model.to(torch.device("cpu"))
+            if hasattr(model, "float"):
+                model.float()
+        except Exception:
+            return
+
+    def _force_tts_cpu_float32(tts: Any) -> None:
+        try:
+            synth = getattr(tts, "synthesizer", None)
+            if synth is None:
+                return
+
+            for attr in ("tts_model", "vocoder_model", "model"):
+                m = getattr(synth, attr, None)
+                if m is not None:
+                    _force_cpu_float32(m)
+        except Exception:
+            return
+
+    try:
+        import torch
+
+        torch.set_default_dtype(torch.float32)
+    except Exception:
+        pass
+    tts = TTS(model_id, gpu=False)
+    _force_tts_cpu_float32(tts)
+    return tts
+
+
+def output_sample_rate(tts: Any) -> int:
+    synth = getattr(tts, "synthesizer", None)
+    rate = getattr(synth, "output_sample_rate", None)
+    try:
+        return int(rate) if rate else DEFAULT_SAMPLE_RATE
+    except (TypeError, ValueError):
+        return DEFAULT_SAMPLE_RATE
+
+
+def synthesize_array(tts: Any, text: str, voice_sample: str | None = None) -> tuple[np.ndarray, int]:
+    """Synthesize text to a mono float32 waveform and its sample rate"""
+    tts_kwargs = {
+        "temperature": VOICE_PARAMS.get("temperature"),
+        "length_penalty": VOICE_PARAMS.get("length_penalty"),
+        "repetition_penalty": VOICE_PARAMS.get("repetition_penalty"),
+        "top_k": VOICE_PARAMS.get("top_k"),
+        "top_p": VOICE_PARAMS.get("top_p"),
+        "speed": VOICE_PARAMS.get("speed"),
+        "emotion": VOICE_PARAMS.get("emotion"),
+    }
+    tts_kwargs = {key: value for key, value in tts_kwargs.items() if value is not None}
+    sample_rate = output_sample_rate(tts)
+
+    def _as_array(wav: Any) -> np.ndarray:
+        return np.asarray(wav, dtype=np.float32).reshape(-1)
+
+    if voice_sample and Path(voice_sample).exists():
+        try:
+            return _as_array(tts.tts(text=text, speaker_wav=voice_sample, **tts_kwargs)), sample_rate
+        except TypeError:
+            fallback_kwargs = {key: value for key, value in tts_kwargs.items() if key != "emotion"}
+            return _as_array(tts.tts(text=text, speaker_wav=voice_sample, **fallback_kwargs)), sample_rate
+
+    speaker: str | None = None
+    try:
+        speakers = getattr(tts, "speakers", None)
+        if isinstance(speakers, (list, tuple)) and speakers:
+            speaker = str(speakers[0])
+    except Exception:
+        speaker = None
+
+    # Skip language detection - model is not multi-lingual
+    base_kwargs = dict(tts_kwargs)
+    if speaker:
+        base_kwargs.setdefault("speaker", speaker)
+
+    for drop_keys in ((), ("emotion",), ("emotion", "speaker")):
+        attempt_kwargs = {k: v for k, v in base_kwargs.items() if k not in drop_keys}
+        try:
+            return _as_array(tts.tts(text=text, **attempt_kwargs)), sample_rate
+        except TypeError:
+            continue
+
+    # Last resort: call tts() with no extras.
+    return _as_array(tts.tts(text=text)), sample_rate
+
+
+def resample_linear(wav: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate or wav.size == 0:
+        return wav
+    target_length = max(1, int(round(wav.size * target_rate / source_rate)))
+    source_positions = np.arange(wav.size, dtype=np.float64)
+    target_positions = np.linspace(0, wav.size - 1, target_length)
+    return np.interp(target_positions, source_positions, wav).astype(np.float32)
+
+
+def concatenate_segments(segments: list[tuple[np.ndarray, int]]) -> tuple[np.ndarray, int]:
+    """Join per-sentence waveforms at the highest sample rate among them"""
+    if not segments:
+        return np.zeros(0, dtype=np.float32), DEFAULT_SAMPLE_RATE
+    target_rate = max(rate for _, rate in segments)
+    joined = np.concatenate([resample_linear(wav, rate, target_rate) for wav, rate in segments])
+    return joined.astype(np.float32, copy=False), target_rate
+
+
+def _init_worker(model_id: str, torch_threads: int, cores: list[int]) -> None:
+    global _worker_tts
+    pin_current_thread(cores)
+    set_process_threads(max(1, torch_threads))
+    _worker_tts = load_tts(model_id)
+
+
+def _synthesize_in_worker(text: str, voice_sample: str | None) -> tuple[np.ndarray, int]:
+    if _worker_tts is None:
+        raise RuntimeError("TTS worker not initialized")
+    return synthesize_array(_worker_tts, text, voice_sample)
+
+
+class TTSProcessPool:
+    def __init__(
+        self,
+        model_id: str,
+        workers: int,
+        torch_threads: int | None = None,
+        cores: list[int] | None = None,
+    ) -> None:
+        self.model_id = model_id
+        self.workers = max(1, workers)
+        # Workers share the TTS core set; each gets an equal slice of its threads.
+        self.cores = list(cores or [])
+        self.torch_threads = torch_threads or max(1, (len(self.cores) or os.cpu_count() or 1) // self.workers)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forked children would inherit torch/OpenMP thread state from the parent.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_id, self.torch_threads, self.cores),
+            )
+        return self._executor
+
+    async def synthesize(self, text: str, out_wav: Path, voice_sample: str | None = None) -> None:
+        executor = self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        sentences = split_sentences(text) or [text]
+        segments = await asyncio.gather(
+            *(loop.run_in_executor(executor, _synthesize_in_worker, sentence, voice_sample) for sentence in sentences)
+        )
+        wav, sample_rate = concatenate_segments(list(segments))
+        await asyncio.to_thread(sf.write, str(out_wav), wav, sample_rate)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+MARZ Adaptive Bitrate Check
+
+Drives a WebRTCVideoStreamer in real time at the stream frame rate, with
+acks coming back from a simulated link, and checks how the adaptive bitrate
+controller reacts:
+
+1. lossy: a healthy link, then 20% of acks go missing. The loss must show up
+   in the metrics and the tier must step down before the scenario ends.
+2. silent: a healthy link, then acks stop altogether while frames keep going
+   out. The tier must step down within --max-downgrade-s of the last ack.
+
+It exits non-zero if either scenario fails.
+
+Usage: python verify_adaptive_bitrate.py [--healthy-s 2] [--impaired-s 4] [--max-downgrade-s 3]
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Optional
+
+from webrtc_streaming import StreamConfig, WebRTCVideoStreamer
+
+ACK_DELAY_MS = 20.0
+
+
+def run_scenario(
+    name: str,
+    ack_probability: float,
+    healthy_s: float,
+    impaired_s: float,
+    config: StreamConfig,
+) -> dict:
+    """Healthy link for healthy_s, then acks arrive with ack_probability for impaired_s"""
+    streamer = WebRTCVideoStreamer(config)
+    rng = random.Random(7)
+    frame_interval = 1.0 / config.fps
+    in_flight: list[tuple[float, int]] = []
+    downgraded_at: Optional[float] = None
+    loss_seen_at: Optional[float] = None
+
+    start = time.monotonic()
+    impaired_from = start + healthy_s
+    frame_id = 0
+    while time.monotonic() < impaired_from + impaired_s:
+        now = time.monotonic()
+        impaired = now >= impaired_from
+        # Acks whose simulated link delay has passed arrive before the next send.
+        while in_flight and in_flight[0][0] <= now:
+            streamer.record_frame_ack(in_flight.pop(0)[1])
+        streamer.record_frame_sent(frame_id)
+        if not impaired or rng.random() < ack_probability:
+            in_flight.append((now + ACK_DELAY_MS / 1000, frame_id))
+        frame_id += 1
+
+        if impaired:
+            if downgraded_at is None and streamer.tier.name != "high":
+                downgraded_at = now - impaired_from
+            if loss_seen_at is None and streamer.monitor.get_metrics().packet_loss_percent > 0:
+                loss_seen_at = now - impaired_from
+        elif streamer.tier.name != "high":
+            raise RuntimeError(f"{name}: downgraded while the link was healthy")
+        time.sleep(max(0.0, start + frame_id * frame_interval - time.monotonic()))
+
+    metrics = streamer.monitor.get_metrics()
+    return {
+        "name": name,
+        "frames_sent": frame_id,
+        "tier": streamer.tier.name,
+        "downgraded_after_s": downgraded_at,
+        "loss_seen_after_s": loss_seen_at,
+        "packet_loss_percent": metrics.packet_loss_percent,
+        "p95_latency_ms": metrics.p95_latency_ms,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--healthy-s", type=float, default=2.0)
+    parser.add_argument("--impaired-s", type=float, default=4.0)
+    parser.add_argument("--max-downgrade-s", type=float, default=3.0)
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+
+    config = StreamConfig(fps=args.fps)
+    results = [
+        run_scenario("lossy", 0.8, args.healthy_s, args.impaired_s, config),
+        run_scenario("silent", 0.0, args.healthy_s, args.impaired_s, config),
+    ]
+
+    failures = []
+    print(f"{'=' * 60}")
+    for result in results:
+        downgraded = result["downgraded_after_s"]
+        loss_seen = result["loss_seen_after_s"]
+        print(f"{result['name']:<8} frames {result['frames_sent']}, tier {result['tier']}, "
+              f"loss {result['packet_loss_percent']:.1f}% (first seen "
+              f"{'never' if loss_seen is None else f'{loss_seen:.2f}s'}), "
+              f"p95 {result['p95_latency_ms']:.0f}ms, downgraded after "
+              f"{'never' if downgraded is None else f'{downgraded:.2f}s'}")
+        if loss_seen is None:
+            failures.append(f"{result['name']}: loss never reported")
+        limit = args.max_downgrade_s if result["name"] == "silent" else args.impaired_s
+        if downgraded is None or downgraded > limit:
+            failures.append(f"{result['name']}: no downgrade within {limit:.1f}s")
+    print(f"{'=' * 60}")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Adaptive bitrate reacts to loss and silent links")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
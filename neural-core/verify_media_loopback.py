@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+MARZ Media Transport Loopback Check
+
+Runs the WebRTC media path end to end on one host: a stream plays a test
+pattern (moving gradient plus a 440 Hz tone) over RTP/UDP to a receiver that
+reassembles and decodes the JPEG frames and acks each one. The check then
+reports frame delivery and the ack latency the stream's LatencyMonitor saw.
+It exits non-zero if frames go missing or p95 latency exceeds the target.
+
+By default the service runs in-process. With --gateway the check goes through
+a running gateway_enterprise instead, using its WebSocket signaling.
+
+Usage: python verify_media_loopback.py [--seconds 3] [--resolution 1280x720] [--fps 30]
+                                       [--gateway ws://127.0.0.1:8080] [--max-p95-ms 200]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+
+import cv2
+import numpy as np
+
+from media_transport import MediaReceiver
+from webrtc_streaming import MARZVideoPresenceService, StreamConfig
+
+
+class DecodingReceiver(MediaReceiver):
+    """Receiver that also decodes every frame, as a real client would before display"""
+
+    def __init__(self, ssrc: int, token: str):
+        super().__init__(ssrc, token, on_frame=self._decode)
+        self.decode_failures = 0
+        self.frame_size: tuple[int, int] = (0, 0)
+
+    def _decode(self, frame_id: int, timestamp: int, jpeg: bytes) -> None:
+        image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self.decode_failures += 1
+        else:
+            self.frame_size = (image.shape[1], image.shape[0])
+
+
+async def _say_hello(receiver: MediaReceiver, host: str, port: int) -> None:
+    await receiver.connect(host, port)
+    # UDP may drop the hello; repeat until media arrives or the stream reports connected.
+    for _ in range(20):
+        receiver.hello()
+        try:
+            await asyncio.wait_for(receiver.first_packet.wait(), 0.25)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_in_process(args: argparse.Namespace) -> tuple[dict, DecodingReceiver]:
+    width, height = (int(v) for v in args.resolution.split("x"))
+    config = StreamConfig(resolution=(width, height), fps=args.fps)
+    service = MARZVideoPresenceService(config, media_host="127.0.0.1", media_port=0)
+    await service.initialize()
+    try:
+        streamer = await service.create_stream_for_client("loopback")
+        offer = streamer.media_offer("127.0.0.1")
+        receiver = DecodingReceiver(offer["ssrc"], offer["token"])
+        await _say_hello(receiver, offer["host"], offer["port"])
+        if not await streamer.wait_media(5.0):
+            raise RuntimeError("stream never saw the receiver's hello")
+
+        playout = await streamer.play_test_pattern(args.seconds)
+        # Give the last acks time to come back.
+        await asyncio.sleep(0.2)
+        report = {"playout": playout, "stream": streamer.get_stats(), "transport": service.transport.get_stats()}
+        receiver.close()
+        return report, receiver
+    finally:
+        await service.shutdown()
+
+
+async def run_via_gateway(args: argparse.Namespace) -> tuple[dict, DecodingReceiver]:
+    import websockets
+
+    url = f"{args.gateway.rstrip('/')}/ws/webrtc/loopback-{uuid.uuid4().hex[:8]}"
+    async with websockets.connect(url) as ws:
+        connected = json.loads(await ws.recv())
+        offer = connected.get("media")
+        if not offer:
+            raise RuntimeError(f"gateway did not offer a media transport: {connected}")
+        receiver = DecodingReceiver(offer["ssrc"], offer["token"])
+        await _say_hello(receiver, offer["host"], offer["port"])
+
+        async def _expect(kind: str) -> dict:
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), args.seconds + 30))
+                if message.get("type") == "error":
+                    raise RuntimeError(message.get("message"))
+                if message.get("type") == kind:
+                    return message
+
+        await _expect("media_connected")
+        await ws.send(json.dumps({"type": "media_test", "seconds": args.seconds}))
+        done = await _expect("media_test_done")
+        await asyncio.sleep(0.2)
+        await ws.send(json.dumps({"type": "get_metrics"}))
+        metrics = await _expect("metrics")
+        await ws.send(json.dumps({"type": "disconnect"}))
+        receiver.close()
+        stream = done["stream"]
+        stream.update(
+            average_latency_ms=metrics["latency_ms"],
+            p95_latency_ms=metrics["p95_latency_ms"],
+            jitter_ms=metrics["jitter_ms"],
+            packet_loss_percent=metrics["packet_loss_percent"],
+        )
+        return {"playout": done["playout"], "stream": stream}, receiver
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gateway", help="ws://host:port of a running gateway_enterprise")
+    parser.add_argument("--max-p95-ms", type=float, default=200.0)
+    parser.add_argument("--min-delivery", type=float, default=0.95, help="Fraction of sent frames that must arrive")
+    args = parser.parse_args()
+
+    runner = run_via_gateway if args.gateway else run_in_process
+    report, receiver = asyncio.run(runner(args))
+    playout, stream = report["playout"], report["stream"]
+
+    sent = playout["frames_sent"]
+    delivery = receiver.frames_completed / sent if sent else 0.0
+    expected_audio = int(args.seconds * 1000 / 20)
+    print(f"{'=' * 60}")
+    print(f"Frames sent/received:  {sent}/{receiver.frames_completed} ({delivery:.1%}), "
+          f"paced out {playout['frames_paced_out']}, late {playout['frames_late']}")
+    print(f"Decoded frame size:    {receiver.frame_size[0]}x{receiver.frame_size[1]}, "
+          f"decode failures {receiver.decode_failures}")
+    print(f"Video bytes:           {receiver.video_bytes / 1024:.0f}KB "
+          f"(~{receiver.video_bytes * 8 / 1000 / args.seconds:.0f} kbps), "
+          f"jpeg quality {stream['media']['jpeg_quality']}")
+    print(f"Audio packets:         {receiver.audio_packets}/{expected_audio}")
+    print(f"First frame:           {playout['first_frame_ms'] or 0:.1f}ms after the render opened the stream")
+    print(f"Ack latency:           avg {stream['average_latency_ms']:.2f}ms, p95 {stream['p95_latency_ms']:.2f}ms, "
+          f"jitter {stream['jitter_ms']:.2f}ms, loss {stream['packet_loss_percent']:.2f}%")
+    print(f"Quality tier:          {stream['quality_tier']['name']}")
+    print(f"{'=' * 60}")
+
+    failures = []
+    if delivery < args.min_delivery:
+        failures.append(f"delivery {delivery:.1%} < {args.min_delivery:.0%}")
+    if receiver.decode_failures:
+        failures.append(f"{receiver.decode_failures} frames failed to decode")
+    if receiver.audio_packets < expected_audio * args.min_delivery:
+        failures.append(f"only {receiver.audio_packets} of {expected_audio} audio packets arrived")
+    if stream["p95_latency_ms"] > args.max_p95_ms:
+        failures.append(f"p95 latency {stream['p95_latency_ms']:.1f}ms > {args.max_p95_ms:.0f}ms")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Media path OK")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
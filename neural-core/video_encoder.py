@@ -0,0 +1,165 @@
+"""
+Single-pass piped H.264 encoder for rendered frames.
+
+Raw rgb24 frames are written to ffmpeg's stdin as they are produced and the
+audio track is muxed in the same invocation, so a render needs no
+intermediate video file and encoding overlaps with frame generation.
+Without an output path the encoder streams fragmented MP4 on stdout, read
+back as an init segment followed by one fragment per keyframe interval.
+"""
+
+import struct
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+
+_STDERR_TAIL_BYTES = 16 * 1024
+# Fragmented MP4 is a sequence of top-level boxes: ftyp + moov, then moof + mdat pairs.
+_SEGMENT_END_BOXES = {b"moov", b"mdat"}
+
+
+class RawVideoEncoder:
+    """ffmpeg process that encodes rgb24 frames from stdin and muxes an audio file"""
+
+    def __init__(
+        self,
+        output_path: Optional[Path],
+        width: int,
+        height: int,
+        fps: float,
+        audio_path: Optional[Path] = None,
+        preset: str = "veryfast",
+        audio_bitrate: str = "192k",
+        keyframe_interval: int = 0,
+    ):
+        # output_path=None streams fragmented MP4 on stdout; read it with segments().
+        self.output_path = Path(output_path) if output_path is not None else None
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio_path = audio_path
+        self.preset = preset
+        self.audio_bitrate = audio_bitrate
+        self.keyframe_interval = keyframe_interval
+        self.frames_written = 0
+        self.bytes_written = 0
+        # Time spent inside stdin writes, i.e. waiting for ffmpeg to drain the pipe.
+        self.write_seconds = 0.0
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr = bytearray()
+        self._stderr_thread: Optional[threading.Thread] = None
+
+    def command(self) -> list[str]:
+        command = [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{self.width}x{self.height}", "-r", f"{self.fps:.6f}",
+            "-i", "pipe:0",
+        ]
+        if self.audio_path is not None:
+            command += ["-i", str(self.audio_path), "-map", "0:v:0", "-map", "1:a:0"]
+        command += [
+            # yuv420p needs even dimensions.
+            "-vf", "crop=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-c:v", "libx264", "-preset", self.preset, "-tune", "zerolatency",
+            "-pix_fmt", "yuv420p",
+        ]
+        if self.keyframe_interval > 0:
+            command += ["-g", str(self.keyframe_interval)]
+        if self.audio_path is not None:
+            command += ["-c:a", "aac", "-b:a", self.audio_bitrate, "-shortest"]
+        if self.output_path is None:
+            command += ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov+default_base_moof", "pipe:1"]
+        else:
+            command += ["-movflags", "+faststart", str(self.output_path)]
+        return command
+
+    def _drain_stderr(self) -> None:
+        # Drained continuously so a chatty ffmpeg never blocks on a full stderr pipe.
+        for line in iter(self._process.stderr.readline, b""):
+            self._stderr.extend(line)
+            if len(self._stderr) > _STDERR_TAIL_BYTES:
+                del self._stderr[:-_STDERR_TAIL_BYTES]
+
+    def start(self) -> "RawVideoEncoder":
+        if self._process is None:
+            self._process = subprocess.Popen(
+                self.command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE if self.output_path is None else None,
+                stderr=subprocess.PIPE,
+            )
+            self._stderr_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+            self._stderr_thread.start()
+        return self
+
+    def write(self, frames: np.ndarray) -> None:
+        """Write one (H, W, 3) frame or a (N, H, W, 3) block of uint8 RGB frames"""
+        if self._process is None:
+            self.start()
+        block = np.ascontiguousarray(frames, dtype=np.uint8)
+        started = time.perf_counter()
+        try:
+            self._process.stdin.write(block.data)
+        except BrokenPipeError:
+            self._finish()
+            raise RuntimeError(f"ffmpeg encoder exited early: {self.error_output()}")
+        self.write_seconds += time.perf_counter() - started
+        self.bytes_written += block.nbytes
+        self.frames_written += 1 if block.ndim == 3 else len(block)
+
+    def segments(self) -> Iterator[bytes]:
+        """Streaming mode: yield the init segment (ftyp + moov), then each moof + mdat fragment"""
+        stdout = self._process.stdout
+        pending = bytearray()
+        while True:
+            header = stdout.read(8)
+            if len(header) < 8:
+                break
+            size, box_type = struct.unpack(">I4s", header)
+            box = bytearray(header)
+            if size == 1:
+                extended = stdout.read(8)
+                box += extended
+                size = struct.unpack(">Q", extended)[0]
+            body_size = size - len(box) if size else -1
+            body = stdout.read(body_size) if body_size else b""
+            pending += box
+            pending += body
+            if box_type in _SEGMENT_END_BOXES or not size:
+                yield bytes(pending)
+                pending.clear()
+        if pending:
+            yield bytes(pending)
+
+    def error_output(self) -> str:
+        return bytes(self._stderr).decode("utf-8", errors="ignore")
+
+    def _finish(self) -> int:
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        if self._stderr_thread is not None:
+            self._stderr_thread.join(timeout=5)
+        return returncode
+
+    def close(self) -> None:
+        """Flush stdin and wait for the encoder; raises if ffmpeg failed"""
+        if self._process is None:
+            raise RuntimeError("Encoder was never started")
+        if self.frames_written == 0:
+            self.abort()
+            raise ValueError("No frames to assemble")
+        if self._finish() != 0 or (self.output_path is not None and not self.output_path.exists()):
+            raise RuntimeError(f"ffmpeg encode failed: {self.error_output()}")
+
+    def abort(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
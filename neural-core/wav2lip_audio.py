@@ -0,0 +1,53 @@
+"""
+Wav2Lip mel spectrogram frontend.
+
+A copy of audio.melspectrogram and the hparams it reads from the Wav2Lip
+repo, so the lip-sync pipeline does not need the repo on sys.path. The
+exported generator backends and cached face boxes mean a process can render
+without ever importing from the checkout. Output matches upstream: 80 mel
+bands, normalized to [-4, 4].
+"""
+
+from functools import lru_cache
+
+import librosa
+import numpy as np
+
+# Upstream hparams.py values the generator was trained with.
+NUM_MELS = 80
+N_FFT = 800
+WIN_SIZE = 800
+FMIN = 55
+FMAX = 7600
+PREEMPHASIS = 0.97
+REF_LEVEL_DB = 20
+MIN_LEVEL_DB = -100
+MAX_ABS_VALUE = 4.0
+
+
+@lru_cache(maxsize=4)
+def _mel_basis(sample_rate: int) -> np.ndarray:
+    return librosa.filters.mel(sr=sample_rate, n_fft=N_FFT, n_mels=NUM_MELS, fmin=FMIN, fmax=FMAX)
+
+
+def _preemphasis(wav: np.ndarray) -> np.ndarray:
+    # Same as scipy.signal.lfilter([1, -k], [1], wav), which also computes in float64.
+    wav = np.asarray(wav, dtype=np.float64)
+    out = np.empty_like(wav)
+    out[0] = wav[0]
+    out[1:] = wav[1:] - PREEMPHASIS * wav[:-1]
+    return out
+
+
+def melspectrogram(wav: np.ndarray, sample_rate: int = 16000, hop_size: int = 200) -> np.ndarray:
+    """(NUM_MELS, frames) normalized mel spectrogram of mono float audio, one frame per hop_size samples"""
+    stft = librosa.stft(y=_preemphasis(wav), n_fft=N_FFT, hop_length=hop_size, win_length=WIN_SIZE)
+    mel = np.dot(_mel_basis(sample_rate), np.abs(stft))
+    min_level = np.exp(MIN_LEVEL_DB / 20 * np.log(10))
+    spec = 20 * np.log10(np.maximum(min_level, mel)) - REF_LEVEL_DB
+    # Symmetric normalization with clipping, as with signal_normalization=True upstream.
+    return np.clip(
+        (2 * MAX_ABS_VALUE) * ((spec - MIN_LEVEL_DB) / -MIN_LEVEL_DB) - MAX_ABS_VALUE,
+        -MAX_ABS_VALUE,
+        MAX_ABS_VALUE,
+    )
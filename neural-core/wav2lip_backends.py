@@ -0,0 +1,135 @@
+"""
+Wav2Lip generator backends.
+
+The generator can run as the eager PyTorch module from the Wav2Lip repo
+checkout, or from a one-time export: a frozen TorchScript module or an ONNX
+graph run by onnxruntime. Exported backends need neither the repo checkout
+nor the .pth checkpoint at runtime. Every backend has the same call
+signature as the eager model: (mel, face) float32 tensors in, generated
+faces out as a tensor on the caller's device.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+import torch
+
+GENERATOR_BACKENDS = ("eager", "torchscript", "onnx")
+
+_EXPORT_SUFFIXES = {"torchscript": ".ts", "onnx": ".onnx"}
+# (mel, face) example shapes per row: one 80x16 mel window and a 6-channel face crop.
+_MEL_SHAPE = (1, 80, 16)
+_ONNX_OPSET = 17
+
+
+def exported_model_path(checkpoint_path: str | Path, backend: str) -> Path:
+    """Default export location: next to the checkpoint, backend-specific suffix"""
+    return Path(checkpoint_path).with_suffix(_EXPORT_SUFFIXES[backend])
+
+
+def example_inputs(batch_size: int, face_resolution: tuple[int, int]) -> tuple[torch.Tensor, torch.Tensor]:
+    width, height = face_resolution
+    mel = torch.rand((batch_size,) + _MEL_SHAPE, dtype=torch.float32)
+    face = torch.rand((batch_size, 6, height, width), dtype=torch.float32)
+    return mel, face
+
+
+def load_eager_generator(repo_path: str, checkpoint_path: str, device: str) -> torch.nn.Module:
+    """The upstream models.Wav2Lip class with checkpoint weights, in eval mode"""
+    if repo_path not in sys.path:
+        sys.path.insert(0, repo_path)
+    from models import Wav2Lip
+
+    model = Wav2Lip()
+    checkpoint = torch.load(checkpoint_path, map_location=device)
+    # Checkpoints saved from DataParallel prefix every key with "module.".
+    state = {key.replace("module.", "", 1): value for key, value in checkpoint["state_dict"].items()}
+    model.load_state_dict(state)
+    return model.to(device).eval()
+
+
+def export_torchscript(
+    model: torch.nn.Module,
+    output_path: str | Path,
+    face_resolution: tuple[int, int] = (96, 96),
+) -> Path:
+    """Trace and freeze the generator; batch size stays dynamic"""
+    model = model.cpu().eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_inputs(2, face_resolution))
+        frozen = torch.jit.freeze(traced)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    frozen.save(str(output_path))
+    return output_path
+
+
+def export_onnx(
+    model: torch.nn.Module,
+    output_path: str | Path,
+    face_resolution: tuple[int, int] = (96, 96),
+) -> Path:
+    """Export the generator as an ONNX graph with a dynamic batch axis"""
+    model = model.cpu().eval()
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            example_inputs(2, face_resolution),
+            str(output_path),
+            input_names=["mel", "face"],
+            output_names=["generated"],
+            dynamic_axes={"mel": {0: "batch"}, "face": {0: "batch"}, "generated": {0: "batch"}},
+            opset_version=_ONNX_OPSET,
+            dynamo=False,
+        )
+    return output_path
+
+
+class OnnxGenerator:
+    """onnxruntime session behind the eager generator's call signature"""
+
+    def __init__(self, model_path: str | Path, device: str, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        providers = ["CPUExecutionProvider"]
+        if str(device).startswith("cuda") and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, ("CUDAExecutionProvider", {"device_id": torch.device(device).index or 0}))
+        self.device = device
+        self.session = ort.InferenceSession(str(model_path), options, providers=providers)
+
+    def __call__(self, mel: torch.Tensor, face: torch.Tensor) -> torch.Tensor:
+        feeds = {
+            "mel": mel.detach().cpu().numpy(),
+            "face": face.detach().cpu().numpy(),
+        }
+        generated = self.session.run(["generated"], feeds)[0]
+        return torch.from_numpy(generated).to(self.device)
+
+
+def load_generator(
+    backend: str,
+    device: str,
+    checkpoint_path: str,
+    repo_path: str,
+    exported_path: Optional[str] = None,
+    threads: int = 0,
+) -> Any:
+    """Load the generator for a backend; exported backends read exported_path or the default export location"""
+    if backend not in GENERATOR_BACKENDS:
+        raise ValueError(f"Unknown Wav2Lip backend {backend!r}; expected one of {', '.join(GENERATOR_BACKENDS)}")
+    if backend == "eager":
+        return load_eager_generator(repo_path, checkpoint_path, device)
+
+    path = Path(exported_path) if exported_path else exported_model_path(checkpoint_path, backend)
+    if not path.exists():
+        raise FileNotFoundError(f"Exported {backend} model not found: {path} (run export_wav2lip.py)")
+    if backend == "torchscript":
+        return torch.jit.load(str(path), map_location=device).eval()
+    return OnnxGenerator(path, device, threads)
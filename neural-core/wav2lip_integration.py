@@ -6,28 +6,46 @@ for MARZ's real-time video presence system.
 
 import asyncio
 import base64
+import hashlib
+import json
 import os
+import queue
+import random
 import tempfile
 import time
 from pathlib import Path
-from typing import Any, Optional
-from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Optional
+from dataclasses import asdict, dataclass, field
 import subprocess
+import threading
+from collections import deque
 import aiofiles
 import aiofiles.os
 import torch
 import numpy as np
-import soundfile as sf
 import ffmpeg
 
 from pydantic import BaseModel
 
+from avatar_store import AvatarFrameStore, probe_video
+from face_tracking import TemplateTracker, gray_thumbnails, keyframe_indices, scene_cuts, smooth_tracks
+from inference_batcher import InferenceBatcher
+from render_cache import RenderCache
+from render_profile import RenderProfile
+from resource_plan import StageExecutor, StagePlan, format_cores, pin_current_thread, set_process_threads
+from video_encoder import RawVideoEncoder
+from wav2lip_backends import exported_model_path, load_generator
+
 
 @dataclass
 class Wav2LipConfig:
     """Configuration for Wav2Lip inference"""
     checkpoint_path: str = "/opt/Wav2Lip/checkpoints/wav2lip_gan.pth"
     repo_path: str = "/opt/Wav2Lip"
+    # "eager" loads models.Wav2Lip from repo_path; "torchscript" and "onnx" load the
+    # export_wav2lip.py output from exported_model_path (default: next to the checkpoint).
+    inference_backend: str = "eager"
+    exported_model_path: Optional[str] = None
     face_resolution: tuple[int, int] = (96, 96)
     fps: int = 25
     pads: tuple[int, int, int, int] = field(default_factory=lambda: (0, 0, 0, 0))
@@ -39,6 +57,110 @@ class Wav2LipConfig:
     nosmooth: bool = False
     static: bool = False
     crop: tuple[int, int, int, int] = field(default_factory=lambda: (-1, -1, -1, -1))
+    avatar_cache_dir: Optional[str] = "/workspace/neural-core/data/avatars"
+    cpu_cores: tuple[int, ...] = ()
+    cpu_threads: int = 0
+    # Wav2Lip's mel frontend expects 16 kHz mono audio.
+    audio_sample_rate: int = 16000
+    decode_chunk_frames: int = 32
+    # Mel frames are hop_size samples apart; each video frame gets a mel_step_size window.
+    mel_hop_size: int = 200
+    mel_step_size: int = 16
+    # Cap on the frame/audio buffers one render may allocate; 0 disables the cap.
+    max_render_memory_mb: int = 4096
+    # Face detector runs every N frames and at scene cuts; boxes in between are
+    # tracked by template matching. 1 runs the detector on every frame.
+    face_keyframe_interval: int = 5
+    scene_change_threshold: float = 24.0
+    face_track_min_score: float = 0.5
+    smooth_window: int = 5
+    # Rendered videos cached on disk by content hash of avatar, audio and render settings.
+    render_cache_dir: Optional[str] = "/workspace/neural-core/data/render-cache"
+    render_cache_max_mb: int = 2048
+    # Renders prepare frames concurrently; one batcher thread owns the model and
+    # packs face/mel chunks from all of them into shared batches.
+    max_concurrent_renders: int = 4
+    batch_wait_ms: float = 4.0
+    # Fraction of renders that collect a per-phase profile when the caller does not ask explicitly.
+    profile_sample_rate: float = 0.0
+    # Process only the union of an avatar's face boxes (cached in the frame store after the
+    # first render) and paste it back onto the full source frame when encoding. Skipped when
+    # that region covers more than roi_max_area_fraction of the frame.
+    roi_processing: bool = True
+    roi_max_area_fraction: float = 0.5
+    # Renders stream output frames through crop, composite and encode stages in chunks of
+    # stream_chunk_frames, with at most pipeline_depth chunks queued between stages.
+    stream_chunk_frames: int = 16
+    pipeline_depth: int = 2
+
+
+# Settings that only affect speed or placement, not the rendered pixels.
+_RENDER_INDEPENDENT_FIELDS = {
+    "gpu_id",
+    "enable_gpu_acceleration",
+    "face_det_batch_size",
+    "wav2lip_batch_size",
+    "avatar_cache_dir",
+    "cpu_cores",
+    "cpu_threads",
+    "decode_chunk_frames",
+    "max_render_memory_mb",
+    "render_cache_dir",
+    "render_cache_max_mb",
+    "max_concurrent_renders",
+    "batch_wait_ms",
+    "profile_sample_rate",
+    "roi_processing",
+    "roi_max_area_fraction",
+    "stream_chunk_frames",
+    "pipeline_depth",
+}
+
+# Settings that change which face boxes detection produces.
+_DETECTION_FIELDS = (
+    "pads",
+    "nosmooth",
+    "smooth_window",
+    "face_keyframe_interval",
+    "scene_change_threshold",
+    "face_track_min_score",
+)
+
+
+def render_fingerprint(config: Wav2LipConfig) -> dict[str, Any]:
+    """Config fields that change render output, for cache keys"""
+    fingerprint = {key: value for key, value in asdict(config).items() if key not in _RENDER_INDEPENDENT_FIELDS}
+    checkpoint = Path(config.checkpoint_path)
+    if config.inference_backend != "eager":
+        checkpoint = Path(config.exported_model_path or exported_model_path(checkpoint, config.inference_backend))
+    if checkpoint.exists():
+        stat = checkpoint.stat()
+        fingerprint["checkpoint_stat"] = (stat.st_size, stat.st_mtime_ns)
+    return fingerprint
+
+
+def _detection_tag(config: Wav2LipConfig) -> str:
+    """Short hash of the detection settings, so cached face boxes are reused only under the same settings"""
+    settings = {name: getattr(config, name) for name in _DETECTION_FIELDS}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _face_roi(
+    detections: list[Optional[np.ndarray]],
+    height: int,
+    width: int,
+    max_area_fraction: float,
+) -> Optional[tuple[int, int, int, int]]:
+    """Union of all face boxes clipped to the frame, or None when it would not save enough"""
+    boxes = [box for box in detections if box is not None]
+    if not boxes:
+        return None
+    stacked = np.stack(boxes)
+    x1, y1 = max(0, int(stacked[:, 0].min())), max(0, int(stacked[:, 1].min()))
+    x2, y2 = min(width, int(stacked[:, 2].max())), min(height, int(stacked[:, 3].max()))
+    if x2 <= x1 or y2 <= y1 or (x2 - x1) * (y2 - y1) > max_area_fraction * width * height:
+        return None
+    return x1, y1, x2, y2
 
 
 @dataclass
@@ -50,8 +172,55 @@ class LatencyMetrics:
     postprocessing_time_ms: float = 0.0
     total_time_ms: float = 0.0
     gpu_memory_used_mb: float = 0.0
+    peak_memory_mb: float = 0.0
     success: bool = False
     error_message: str = ""
+    # RenderProfile summary for profiled renders
+    profile: Optional[dict[str, Any]] = None
+
+
+def _is_out_of_memory(error: BaseException) -> bool:
+    if isinstance(error, MemoryError):
+        return True
+    oom_type = getattr(getattr(torch, "cuda", None), "OutOfMemoryError", None)
+    if oom_type is not None and isinstance(error, oom_type):
+        return True
+    return "out of memory" in str(error).lower()
+
+
+def _release_cuda_cache() -> None:
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+_STILL_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+_COMPOSITE_FEATHER_PX = 10
+_FEATHER_CACHE_SIZE = 256
+
+
+class RenderMemoryBudget:
+    """Accounts the large buffers a render allocates and enforces the per-render cap"""
+    
+    def __init__(self, limit_mb: float):
+        self.limit_bytes = int(limit_mb * 1024 * 1024) if limit_mb > 0 else 0
+        self.current_bytes = 0
+        self.peak_bytes = 0
+    
+    def reserve(self, nbytes: int, label: str) -> None:
+        if self.limit_bytes and self.current_bytes + nbytes > self.limit_bytes:
+            raise MemoryError(
+                f"Render memory cap exceeded allocating {label}: "
+                f"{(self.current_bytes + nbytes) / (1024 * 1024):.0f}MB > {self.limit_bytes / (1024 * 1024):.0f}MB"
+            )
+        self.current_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+    
+    def release(self, nbytes: int) -> None:
+        self.current_bytes = max(0, self.current_bytes - nbytes)
+    
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / (1024 * 1024)
 
 
 class Wav2LipModel:
@@ -66,7 +235,23 @@ class Wav2LipModel:
         self._model: Any = None
         self._device: Optional[str] = None
         self._face_detector: Any = None
+        self._face_detector_lock = threading.Lock()
+        self._batcher: Optional[InferenceBatcher] = None
         self._initialized = False
+        self._feather_cache: dict[tuple[int, int], tuple[np.ndarray, np.ndarray]] = {}
+        self._frame_store: Optional[AvatarFrameStore] = (
+            AvatarFrameStore(config.avatar_cache_dir) if config.avatar_cache_dir else None
+        )
+        # All blocking lip-sync work runs on threads pinned to the lipsync core set.
+        self._stage = StageExecutor(
+            StagePlan(
+                name="lipsync",
+                cores=list(config.cpu_cores),
+                threads=config.cpu_threads or len(config.cpu_cores),
+            ),
+            max_workers=config.max_concurrent_renders,
+        )
+        self._process_threads: dict[str, Any] = {}
     
     @classmethod
     async def get_instance(cls, config: Wav2LipConfig) -> "Wav2LipModel":
@@ -84,36 +269,63 @@ class Wav2LipModel:
             return
         
         def _load_model():
-            import sys
-            sys.path.insert(0, self.config.repo_path)
-            
             if self.config.enable_gpu_acceleration and torch.cuda.is_available():
                 torch.cuda.set_device(self.config.gpu_id)
                 self._device = f"cuda:{self.config.gpu_id}"
             else:
                 self._device = "cpu"
+            # torch/OpenCV thread counts are process-wide: set them here once, not per stage thread.
+            self._process_threads = set_process_threads(self._stage.plan.threads)
             
-            from models import Wav2Lip as Wav2LipModelClass
-            self._model = Wav2LipModelClass()
-            
-            checkpoint = torch.load(self.config.checkpoint_path, map_location=self._device)
-            self._model.load_state_dict(checkpoint["state_dict"])
-            self._model = self._model.to(self._device)
-            self._model.eval()
+            self._model = load_generator(
+                self.config.inference_backend,
+                self._device,
+                self.config.checkpoint_path,
+                self.config.repo_path,
+                exported_path=self.config.exported_model_path,
+                threads=self._stage.plan.threads,
+            )
             
             self._face_detector = None
+            self._batcher = InferenceBatcher(
+                self._model,
+                self._device,
+                self.config.wav2lip_batch_size,
+                self.config.face_resolution,
+                self._stage.plan,
+                batch_wait_ms=self.config.batch_wait_ms,
+            ).start()
             self._initialized = True
         
-        await asyncio.to_thread(_load_model)
+        await self._stage.run(_load_model)
     
     def _load_face_detector(self):
         """Load face detector lazily"""
-        if self._face_detector is not None:
+        with self._face_detector_lock:
+            if self._face_detector is not None:
+                return self._face_detector
+            
+            # The S3FD detector still ships with the Wav2Lip repo checkout.
+            import sys
+            if self.config.repo_path not in sys.path:
+                sys.path.insert(0, self.config.repo_path)
+            from face_detection import FaceAlignment, LandmarksType
+            self._face_detector = FaceAlignment(LandmarksType._2D, flip_input=False, device=self._device)
             return self._face_detector
-        
-        from face_detection import FaceAlignment, LandmarksType
-        self._face_detector = FaceAlignment(LandmarksType._2D, flip_input=False, device=self._device)
-        return self._face_detector
+    
+    def get_resource_layout(self) -> dict[str, Any]:
+        """Core set and thread counts the lip-sync stage actually runs with"""
+        plan = self._stage.plan
+        return {
+            "cores": format_cores(plan.cores),
+            "threads": plan.threads,
+            "applied": dict(plan.applied),
+            "process_threads": dict(self._process_threads),
+        }
+    
+    def get_inference_stats(self) -> Optional[dict[str, Any]]:
+        """Shared-batch counters from the model thread"""
+        return self._batcher.stats() if self._batcher else None
     
     async def get_gpu_memory_usage(self) -> float:
         """Get current GPU memory usage in MB"""
@@ -128,32 +340,49 @@ class Wav2LipModel:
         face_video_path: Path,
         audio_wav_path: Path,
         output_path: Path,
+        priority: int = 0,
+        profile: Optional[bool] = None,
     ) -> LatencyMetrics:
-        """Render lip-synced video with performance metrics"""
+        """
+        Render lip-synced video with performance metrics; higher priority renders batch first.
+        profile=None profiles a config.profile_sample_rate fraction of renders.
+        """
         metrics = LatencyMetrics()
+        budget = RenderMemoryBudget(self.config.max_render_memory_mb)
+        if profile is None:
+            profile = random.random() < self.config.profile_sample_rate
+        profiler = RenderProfile() if profile else None
         start_time = time.perf_counter()
         
         try:
-            if not await aiofiles.os.path.exists(str(face_video_path)):
-                raise FileNotFoundError(f"Face video not found: {face_video_path}")
-            if not await aiofiles.os.path.exists(str(audio_wav_path)):
-                raise FileNotFoundError(f"Audio file not found: {audio_wav_path}")
-            
-            preprocess_start = time.perf_counter()
-            video_frames, audio_data = await self._preprocess_inputs(face_video_path, audio_wav_path)
-            metrics.preprocessing_time_ms = (time.perf_counter() - preprocess_start) * 1000
-            
-            face_detect_start = time.perf_counter()
-            face_detections = await self._detect_faces(video_frames)
-            metrics.face_detection_time_ms = (time.perf_counter() - face_detect_start) * 1000
+            video_frames, face_detections, audio_data, fps, static, roi = await self._prepare_render(
+                face_video_path, audio_wav_path, budget, metrics, profiler
+            )
             
-            inference_start = time.perf_counter()
-            synced_frames = await self._run_inference(video_frames, face_detections, audio_data)
-            metrics.lip_sync_inference_time_ms = (time.perf_counter() - inference_start) * 1000
+            # Frames stream into the encoder as inference finalizes them, so
+            # postprocessing only covers flushing the encoder.
+            height, width = video_frames.shape[1:3]
+            encoder = RawVideoEncoder(output_path, width, height, fps, audio_path=audio_wav_path)
+            try:
+                inference_start = time.perf_counter()
+                await self._run_inference(
+                    video_frames, face_detections, audio_data, fps, budget, encoder, priority, static, profiler, roi
+                )
+                metrics.lip_sync_inference_time_ms = (time.perf_counter() - inference_start) * 1000
+                
+                postprocess_start = time.perf_counter()
+                await self._assemble_video(encoder)
+                metrics.postprocessing_time_ms = (time.perf_counter() - postprocess_start) * 1000
+            finally:
+                encoder.abort()
+                if profiler is not None:
+                    profiler.pipe("encode", encoder.bytes_written, encoder.write_seconds, encoded=True)
             
-            postprocess_start = time.perf_counter()
-            await self._assemble_video(synced_frames, audio_wav_path, output_path)
-            metrics.postprocessing_time_ms = (time.perf_counter() - postprocess_start) * 1000
+            if profiler is not None:
+                frames_out = encoder.frames_written
+                profiler.phase("inference", metrics.lip_sync_inference_time_ms / 1000, frames_out)
+                profiler.phase("postprocessing", metrics.postprocessing_time_ms / 1000, frames_out)
+                profiler.output_bytes = output_path.stat().st_size
             
             metrics.total_time_ms = (time.perf_counter() - start_time) * 1000
             metrics.gpu_memory_used_mb = await self.get_gpu_memory_usage()
@@ -164,198 +393,713 @@ class Wav2LipModel:
             metrics.error_message = str(e)
             metrics.total_time_ms = (time.perf_counter() - start_time) * 1000
         
+        metrics.peak_memory_mb = budget.peak_mb
+        if profiler is not None:
+            metrics.profile = profiler.as_dict()
         return metrics
     
-    async def _preprocess_inputs(self, video_path: Path, audio_path: Path) -> tuple[list[np.ndarray], np.ndarray]:
-        """Extract video frames and audio data"""
-        def _extract():
-            frames = []
-            container = ffmpeg.input(str(video_path))
-            probe = ffmpeg.probe(str(video_path))
-            video_info = next(s for s in probe["streams"] if s["codec_type"] == "video")
-            
-            process = (
-                ffmpeg.input(str(video_path))
-                .output("pipe:", format="rawvideo", pix_fmt="rgb24")
-                .run_async(pipe_stdout=True, pipe_stderr=True)
+    async def stream_lipsync(
+        self,
+        face_video_path: Path,
+        audio_wav_path: Path,
+        priority: int = 0,
+        segment_seconds: float = 1.0,
+    ) -> AsyncIterator[bytes]:
+        """
+        Render and yield fragmented MP4 while it is encoded: the init segment first,
+        then one fragment per segment_seconds of video. Closing the generator aborts the render.
+        """
+        budget = RenderMemoryBudget(self.config.max_render_memory_mb)
+        video_frames, face_detections, audio_data, fps, static, roi = await self._prepare_render(
+            face_video_path, audio_wav_path, budget, LatencyMetrics(), None
+        )
+        height, width = video_frames.shape[1:3]
+        encoder = RawVideoEncoder(
+            None, width, height, fps,
+            audio_path=audio_wav_path,
+            keyframe_interval=max(1, round(fps * segment_seconds)),
+        ).start()
+        
+        loop = asyncio.get_running_loop()
+        segments: asyncio.Queue = asyncio.Queue()
+        
+        def _read_segments() -> None:
+            try:
+                for segment in encoder.segments():
+                    loop.call_soon_threadsafe(segments.put_nowait, segment)
+            finally:
+                loop.call_soon_threadsafe(segments.put_nowait, None)
+        
+        async def _render() -> None:
+            try:
+                await self._run_inference(
+                    video_frames, face_detections, audio_data, fps, budget, encoder, priority, static, None, roi
+                )
+                await self._assemble_video(encoder)
+            except BaseException:
+                # Otherwise ffmpeg waits on stdin forever, the segment reader never sees EOF
+                # and the consumer never gets past segments.get() to the render's exception.
+                encoder.abort()
+                raise
+        
+        reader = threading.Thread(target=_read_segments, name="marz-lipsync-segments", daemon=True)
+        reader.start()
+        render = asyncio.create_task(_render())
+        try:
+            while True:
+                segment = await segments.get()
+                if segment is None:
+                    break
+                yield segment
+            await render
+        finally:
+            if not render.done():
+                # Killing ffmpeg makes the pipeline's next write fail, which ends the render.
+                encoder.abort()
+                await asyncio.gather(render, return_exceptions=True)
+            encoder.abort()
+    
+    async def render_frames(
+        self,
+        face_video_path: Path,
+        audio_wav_path: Path,
+        sink: Any,
+        priority: int = 0,
+    ) -> LatencyMetrics:
+        """
+        Render into a frame sink instead of a file: sink.open(width, height, fps, audio,
+        sample_rate) once inputs are decoded, sink.write(frames) as frames finalize, and
+        sink.close() at the end, also on failure.
+        """
+        metrics = LatencyMetrics()
+        budget = RenderMemoryBudget(self.config.max_render_memory_mb)
+        start_time = time.perf_counter()
+        
+        try:
+            video_frames, face_detections, audio_data, fps, static, roi = await self._prepare_render(
+                face_video_path, audio_wav_path, budget, metrics, None
             )
-            out, _ = process.communicate()
-            
-            width = int(video_info["width"])
-            height = int(video_info["height"])
-            frames = np.frombuffer(out, np.uint8).reshape([-1, height, width, 3])
-            
-            audio_data, sample_rate = sf.read(str(audio_path))
+            height, width = video_frames.shape[1:3]
+            sink.open(width, height, fps, audio_data, self.config.audio_sample_rate)
             
-            return frames.tolist(), audio_data
+            inference_start = time.perf_counter()
+            await self._run_inference(
+                video_frames, face_detections, audio_data, fps, budget, sink, priority, static, None, roi
+            )
+            metrics.lip_sync_inference_time_ms = (time.perf_counter() - inference_start) * 1000
+            metrics.total_time_ms = (time.perf_counter() - start_time) * 1000
+            metrics.gpu_memory_used_mb = await self.get_gpu_memory_usage()
+            metrics.success = True
+        
+        except Exception as e:
+            metrics.success = False
+            metrics.error_message = str(e)
+            metrics.total_time_ms = (time.perf_counter() - start_time) * 1000
+        finally:
+            sink.close()
         
-        frames, audio_data = await asyncio.to_thread(_extract)
-        return frames, audio_data
+        metrics.peak_memory_mb = budget.peak_mb
+        return metrics
     
-    async def _detect_faces(self, frames: list[np.ndarray]) -> list[Optional[np.ndarray]]:
-        """Detect faces in video frames"""
+    async def _prepare_render(
+        self,
+        face_video_path: Path,
+        audio_wav_path: Path,
+        budget: RenderMemoryBudget,
+        metrics: LatencyMetrics,
+        profiler: Optional[RenderProfile],
+    ) -> tuple[np.ndarray, list[Optional[np.ndarray]], np.ndarray, float, bool, Optional[tuple[int, int, int, int]]]:
+        """Decode inputs and find faces; returns (frames, detections, audio, fps, static, roi)"""
+        if not await aiofiles.os.path.exists(str(face_video_path)):
+            raise FileNotFoundError(f"Face video not found: {face_video_path}")
+        if not await aiofiles.os.path.exists(str(audio_wav_path)):
+            raise FileNotFoundError(f"Audio file not found: {audio_wav_path}")
+        
+        preprocess_start = time.perf_counter()
+        video_frames, audio_data, fps = await self._preprocess_inputs(
+            face_video_path, audio_wav_path, budget, profiler
+        )
+        # Still images (and config.static) use one base frame: detect and crop once,
+        # then only generate and paste back the face per output frame.
+        still_image = face_video_path.suffix.lower() in _STILL_IMAGE_SUFFIXES
+        static = self.config.static or still_image or len(video_frames) == 1
+        if static:
+            video_frames = video_frames[:1]
+            if still_image:
+                fps = float(self.config.fps)
+        metrics.preprocessing_time_ms = (time.perf_counter() - preprocess_start) * 1000
+        
+        face_detect_start = time.perf_counter()
+        if static or self._frame_store is None:
+            face_detections = await self._detect_faces(video_frames)
+        else:
+            face_detections = await self._detect_faces_cached(face_video_path, video_frames)
+        metrics.face_detection_time_ms = (time.perf_counter() - face_detect_start) * 1000
+        if profiler is not None:
+            profiler.phase("preprocessing", metrics.preprocessing_time_ms / 1000, len(video_frames))
+            profiler.phase("face_detection", metrics.face_detection_time_ms / 1000, len(video_frames))
+        
+        roi = None
+        if self.config.roi_processing and not static:
+            height, width = video_frames.shape[1:3]
+            roi = _face_roi(face_detections, height, width, self.config.roi_max_area_fraction)
+        return video_frames, face_detections, audio_data, fps, static, roi
+    
+    async def register_avatar(self, video_path: Path) -> None:
+        """Decode an avatar into the frame store ahead of its first render"""
+        if self._frame_store is not None:
+            await self._frame_store.register_async(video_path)
+    
+    async def _preprocess_inputs(
+        self,
+        video_path: Path,
+        audio_path: Path,
+        budget: RenderMemoryBudget,
+        profile: Optional[RenderProfile] = None,
+    ) -> tuple[np.ndarray, np.ndarray, float]:
+        """Extract video frames as one (N, H, W, 3) uint8 array, audio at the model rate, and the video fps"""
+        def _extract():
+            if self._frame_store is not None:
+                # Frames come back as a read-only memmap shared through the page cache,
+                # so they do not count against the per-render budget.
+                avatar = self._frame_store.register(video_path)
+                frames, fps = avatar.frames, avatar.fps
+            else:
+                frames, fps = self._decode_frames(video_path, budget, profile)
+            audio_data = self._read_audio(audio_path, budget, profile)
+            return frames, audio_data, fps or float(self.config.fps)
+        
+        return await self._stage.run(_extract)
+    
+    def _decode_frames(
+        self,
+        video_path: Path,
+        budget: RenderMemoryBudget,
+        profile: Optional[RenderProfile] = None,
+    ) -> tuple[np.ndarray, float]:
+        """Stream rgb24 frames from ffmpeg straight into a preallocated array"""
+        info = probe_video(video_path)
+        width, height = info["width"], info["height"]
+        frame_bytes = width * height * 3
+        chunk_bytes = frame_bytes * max(1, self.config.decode_chunk_frames)
+        
+        capacity = info["frame_count"] + max(1, self.config.decode_chunk_frames)
+        budget.reserve(capacity * frame_bytes, "decoded frames")
+        frames = np.empty((capacity, height, width, 3), dtype=np.uint8)
+        filled = 0
+        blocked = 0.0
+        
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-i", str(video_path),
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        try:
+            while True:
+                if filled + chunk_bytes > capacity * frame_bytes:
+                    # Container frame count was missing or short; grow geometrically.
+                    grown = max(capacity * 2, (filled + chunk_bytes) // frame_bytes + 1)
+                    budget.reserve(grown * frame_bytes, "decoded frames")
+                    resized = np.empty((grown, height, width, 3), dtype=np.uint8)
+                    resized.reshape(-1)[:filled] = frames.reshape(-1)[:filled]
+                    budget.release(capacity * frame_bytes)
+                    frames, capacity = resized, grown
+                
+                view = memoryview(frames.reshape(-1))[filled:filled + chunk_bytes]
+                read_start = time.perf_counter()
+                read = process.stdout.readinto(view)
+                blocked += time.perf_counter() - read_start
+                if not read:
+                    break
+                filled += read
+            _, stderr = process.communicate()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg decode failed: {stderr.decode('utf-8', errors='ignore')}")
+        if profile is not None:
+            profile.pipe("decode_video", filled, blocked)
+        count = filled // frame_bytes
+        if count == 0:
+            raise ValueError(f"No frames decoded from video: {video_path}")
+        return frames[:count], info["fps"]
+    
+    def _read_audio(
+        self,
+        audio_path: Path,
+        budget: RenderMemoryBudget,
+        profile: Optional[RenderProfile] = None,
+    ) -> np.ndarray:
+        """Decode audio once as mono float32 at the model's sample rate"""
+        read_start = time.perf_counter()
+        out, _ = (
+            ffmpeg
+            .input(str(audio_path))
+            .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=self.config.audio_sample_rate)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        if profile is not None:
+            profile.pipe("decode_audio", len(out), time.perf_counter() - read_start)
+        budget.reserve(len(out), "audio")
+        return np.frombuffer(out, dtype=np.float32)
+    
+    async def _detect_faces(self, frames: np.ndarray) -> list[Optional[np.ndarray]]:
+        """Detect one padded face box (x1, y1, x2, y2) per frame, None where no face is found"""
         def _detect():
             fa = self._load_face_detector()
-            detections = []
+            count = len(frames)
+            interval = max(1, self.config.face_keyframe_interval)
             
-            for frame in frames:
-                preds = fa.get_landmarks(frame)
-                if len(preds) > 0:
-                    detections.append(preds[0])
-                else:
-                    detections.append(None)
+            if interval == 1:
+                cuts = np.zeros(0, dtype=np.int64)
+                boxes = self._run_detector(fa, frames, np.arange(count))
+            else:
+                cuts = scene_cuts(gray_thumbnails(frames), self.config.scene_change_threshold)
+                keyframes = keyframe_indices(count, interval, cuts)
+                detected = dict(zip(keyframes.tolist(), self._run_detector(fa, frames, keyframes)))
+                boxes, lost = self._track_between_keyframes(frames, detected)
+                if lost:
+                    # Tracking lost the face: treat those frames as keyframes too.
+                    for index, box in zip(lost, self._run_detector(fa, frames, np.array(lost))):
+                        boxes[index] = box
             
-            return detections
+            if self.config.nosmooth:
+                return boxes
+            return smooth_tracks(boxes, cuts, self.config.smooth_window)
+        
+        return await self._stage.run(_detect)
+    
+    async def _detect_faces_cached(self, video_path: Path, frames: np.ndarray) -> list[Optional[np.ndarray]]:
+        """Face boxes of a frame-store avatar are detected on its first render and reused afterwards"""
+        tag = _detection_tag(self.config)
+        cached = await self._stage.run(self._frame_store.load_face_boxes, video_path, tag)
+        if cached is not None and len(cached) == len(frames):
+            return [None if box[0] < 0 else box for box in cached]
+        
+        detections = await self._detect_faces(frames)
+        boxes = np.array([(-1, -1, -1, -1) if box is None else box for box in detections], dtype=np.int32)
+        await self._stage.run(self._frame_store.save_face_boxes, video_path, tag, boxes)
+        return detections
+    
+    def _run_detector(self, fa: Any, frames: np.ndarray, indices: np.ndarray) -> list[Optional[np.ndarray]]:
+        """Batched detector pass over the given frame indices, halving the batch on OOM"""
+        batch_size = max(1, self.config.face_det_batch_size)
+        
+        while True:
+            rects: list[Optional[tuple[int, int, int, int]]] = []
+            try:
+                for start in range(0, len(indices), batch_size):
+                    batch_ids = indices[start:start + batch_size]
+                    if batch_ids[-1] - batch_ids[0] + 1 == len(batch_ids):
+                        batch = frames[batch_ids[0]:batch_ids[-1] + 1]
+                    else:
+                        batch = frames[batch_ids]
+                    # The detector expects BGR batches; a reversed-channel view
+                    # avoids copying the RGB frames here.
+                    rects.extend(fa.get_detections_for_batch(batch[..., ::-1]))
+            except (RuntimeError, MemoryError) as error:
+                if not _is_out_of_memory(error) or batch_size == 1:
+                    raise
+                batch_size //= 2
+                _release_cuda_cache()
+                print(f"[wav2lip] face detection out of memory; retrying with batch size {batch_size}")
+                continue
+            break
+        
+        return [self._pad_box(rect, frames.shape[1], frames.shape[2]) for rect in rects]
+    
+    def _track_between_keyframes(
+        self,
+        frames: np.ndarray,
+        detected: dict[int, Optional[np.ndarray]],
+    ) -> tuple[list[Optional[np.ndarray]], list[int]]:
+        """
+        Propagate keyframe boxes forward; returns boxes and the frames that need the detector:
+        every frame from the one where tracking was lost up to the next keyframe
+        """
+        boxes: list[Optional[np.ndarray]] = [None] * len(frames)
+        lost: list[int] = []
+        tracker: Optional[TemplateTracker] = None
+        tracking_lost = False
+        
+        for index in range(len(frames)):
+            if index in detected:
+                box = detected[index]
+                boxes[index] = box
+                tracker = TemplateTracker(frames[index], box) if box is not None else None
+                tracking_lost = False
+                continue
+            if tracking_lost:
+                lost.append(index)
+                continue
+            if tracker is None:
+                # No face on the keyframe: nothing to track until the next one.
+                continue
+            box, score = tracker.track(frames[index])
+            if score < self.config.face_track_min_score:
+                lost.append(index)
+                tracker = None
+                tracking_lost = True
+                continue
+            boxes[index] = box
         
-        return await asyncio.to_thread(_detect)
+        return boxes, lost
+    
+    def _pad_box(self, rect: Optional[tuple[int, int, int, int]], height: int, width: int) -> Optional[np.ndarray]:
+        if rect is None:
+            return None
+        pad_top, pad_bottom, pad_left, pad_right = self.config.pads
+        x1, y1, x2, y2 = rect
+        return np.array(
+            [
+                max(0, x1 - pad_left),
+                max(0, y1 - pad_top),
+                min(width, x2 + pad_right),
+                min(height, y2 + pad_bottom),
+            ],
+            dtype=np.int32,
+        )
     
     async def _run_inference(
         self,
-        frames: list[np.ndarray],
+        frames: np.ndarray,
         face_detections: list[Optional[np.ndarray]],
         audio_data: np.ndarray,
-    ) -> list[np.ndarray]:
-        """Run Wav2Lip inference"""
+        fps: float,
+        budget: RenderMemoryBudget,
+        encoder: RawVideoEncoder,
+        priority: int = 0,
+        static: bool = False,
+        profile: Optional[RenderProfile] = None,
+        roi: Optional[tuple[int, int, int, int]] = None,
+    ) -> None:
+        """
+        Run Wav2Lip inference and stream the frames into the encoder; one output frame per
+        mel window, looping the source frames. With a roi (x1, y1, x2, y2) only that region is
+        copied, cropped from and composited; the encoder gets it pasted onto the full source frame.
+        """
         def _inference():
-            from hparams import hparams as hp
-            import cv2
-            
-            synced_frames = []
             mel = self._audio_to_mel(audio_data)
-            mel_chunks = self._create_mel_chunks(mel)
-            
-            for i, (frame, face, mel_chunk) in enumerate(zip(frames, face_detections, mel_chunks)):
-                if face is None:
-                    synced_frames.append(frame)
-                    continue
-                
-                cropped_face = self._crop_face(frame, face)
-                resized_face = cv2.resize(cropped_face, (96, 96))
-                normalized_face = resized_face / 255.0
-                input_tensor = torch.FloatTensor(normalized_face.transpose(2, 0, 1)).unsqueeze(0)
-                input_tensor = input_tensor.to(self._device)
-                
-                mel_tensor = torch.FloatTensor(mel_chunk).unsqueeze(0).unsqueeze(0)
-                mel_tensor = mel_tensor.to(self._device)
-                
-                with torch.no_grad():
-                    output = self._model(mel_tensor, input_tensor)
-                
-                output_frame = output.squeeze().cpu().numpy().transpose(1, 2, 0)
-                output_frame = (output_frame * 255).astype(np.uint8)
-                
-                composite = self._composite_face(frame, output_frame, face)
-                synced_frames.append(composite)
+            mel_windows, mel_starts = self._create_mel_chunks(mel, fps)
             
-            return synced_frames
+            if static:
+                self._run_static(
+                    frames[0], face_detections[0], mel_windows, mel_starts, budget, encoder, priority, profile
+                )
+            else:
+                self._run_pipeline(
+                    frames, face_detections, mel_windows, mel_starts, budget, encoder, priority, profile, roi
+                )
         
-        return await asyncio.to_thread(_inference)
+        await self._stage.run(_inference)
+    
+    def _run_pipeline(
+        self,
+        frames: np.ndarray,
+        face_detections: list[Optional[np.ndarray]],
+        mel_windows: np.ndarray,
+        mel_starts: np.ndarray,
+        budget: RenderMemoryBudget,
+        encoder: RawVideoEncoder,
+        priority: int,
+        profile: Optional[RenderProfile],
+        roi: Optional[tuple[int, int, int, int]],
+    ) -> None:
+        """
+        Output frames flow in chunks through three concurrent stages over bounded queues:
+        copy, crop and submit (this thread), composite, and encode. Chunk buffers are recycled
+        through a fixed pool, so memory does not grow with clip length.
+        """
+        count = len(mel_starts)
+        source_count = min(len(frames), len(face_detections))
+        source = frames
+        origin = np.zeros(4, dtype=np.int32)
+        canvases: Optional[np.ndarray] = None
+        if roi is not None:
+            x1, y1, x2, y2 = roi
+            source = frames[:, y1:y2, x1:x2]
+            origin = np.array([x1, y1, x1, y1], dtype=np.int32)
+        
+        chunk_frames = max(1, min(self.config.stream_chunk_frames, count))
+        depth = max(1, self.config.pipeline_depth)
+        # Every buffer is pooled, queued or held by one stage, so the pool size caps memory.
+        pool_size = 2 * depth + 3
+        budget.reserve(pool_size * chunk_frames * source[0].nbytes, "pipeline chunks")
+        if roi is not None:
+            # Persistent full-frame canvases, one per source frame when the budget allows: the
+            # background is copied in once and each output frame only rewrites the ROI.
+            canvas_count = min(source_count, count)
+            try:
+                budget.reserve(canvas_count * frames[0].nbytes, "roi canvases")
+            except MemoryError:
+                canvas_count = 1
+                budget.reserve(frames[0].nbytes, "roi canvas")
+            canvases = np.empty((canvas_count,) + frames.shape[1:], dtype=np.uint8)
+        pool: queue.Queue = queue.Queue()
+        for _ in range(pool_size):
+            pool.put(np.empty((chunk_frames,) + source.shape[1:], dtype=np.uint8))
+        to_composite: queue.Queue = queue.Queue(maxsize=depth)
+        to_encode: queue.Queue = queue.Queue(maxsize=depth)
+        errors: list[BaseException] = []
+        plan = self._stage.plan
+        
+        def _drain(inbox: queue.Queue, outbox: Optional[queue.Queue]) -> None:
+            # After a failure keep recycling buffers up to the end marker so no stage blocks.
+            while (item := inbox.get()) is not None:
+                pool.put(item[0])
+            if outbox is not None:
+                outbox.put(None)
+        
+        def _composite() -> None:
+            pin_current_thread(plan.cores)
+            scratch = np.empty(source.shape[1:], dtype=np.uint8)
+            try:
+                while (item := to_composite.get()) is not None:
+                    buffer, span, slots, boxes, future, submitted = item
+                    try:
+                        wait_start = time.perf_counter()
+                        generated = future.result()
+                        if profile is not None:
+                            done = time.perf_counter()
+                            profile.batch(done - submitted, done - wait_start, len(slots))
+                        for slot, face, box in zip(slots, generated, boxes):
+                            scratch = self._composite_face(buffer[slot], face, box, scratch)
+                    except BaseException:
+                        pool.put(buffer)
+                        raise
+                    to_encode.put((buffer, span))
+                to_encode.put(None)
+            except BaseException as error:
+                errors.append(error)
+                _drain(to_composite, to_encode)
+        
+        def _encode() -> None:
+            pin_current_thread(plan.cores)
+            # Source frame currently painted on each canvas; -1 for none yet.
+            painted = np.full(len(canvases) if canvases is not None else 0, -1, dtype=np.int64)
+            try:
+                while (item := to_encode.get()) is not None:
+                    buffer, span = item
+                    try:
+                        if canvases is None:
+                            encoder.write(buffer[:len(span)])
+                        else:
+                            for slot, index in enumerate(span):
+                                source_id = index % source_count
+                                canvas_id = source_id % len(canvases)
+                                canvas = canvases[canvas_id]
+                                if painted[canvas_id] != source_id:
+                                    np.copyto(canvas, frames[source_id])
+                                    painted[canvas_id] = source_id
+                                canvas[y1:y2, x1:x2] = buffer[slot]
+                                encoder.write(canvas)
+                    finally:
+                        pool.put(buffer)
+            except BaseException as error:
+                errors.append(error)
+                _drain(to_encode, None)
+        
+        stages = [
+            threading.Thread(target=_composite, name="marz-lipsync-composite", daemon=True),
+            threading.Thread(target=_encode, name="marz-lipsync-encode", daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+        width, height = self.config.face_resolution
+        try:
+            for start in range(0, count, chunk_frames):
+                if errors:
+                    break
+                span = range(start, min(start + chunk_frames, count))
+                buffer = pool.get()
+                try:
+                    source_ids = np.arange(span.start, span.stop) % source_count
+                    for slot, source_id in enumerate(source_ids):
+                        np.copyto(buffer[slot], source[source_id])
+                    slots = np.array(
+                        [slot for slot, source_id in enumerate(source_ids) if face_detections[source_id] is not None],
+                        dtype=np.intp,
+                    )
+                    boxes = np.empty((len(slots), 4), dtype=np.int32)
+                    for row, slot in enumerate(slots):
+                        boxes[row] = face_detections[source_ids[slot]]
+                    boxes -= origin
+                    faces = np.empty((len(slots), height, width, 3), dtype=np.uint8)
+                    self._crop_faces(buffer, slots, boxes, faces)
+                    mels = np.ascontiguousarray(mel_windows[mel_starts[start + slots]], dtype=np.float32)
+                    future = self._batcher.submit(faces, mels, priority)
+                except BaseException:
+                    pool.put(buffer)
+                    raise
+                to_composite.put((buffer, span, slots, boxes, future, time.perf_counter()))
+        finally:
+            to_composite.put(None)
+            for stage in stages:
+                stage.join()
+        if errors:
+            raise errors[0]
+    
+    def _run_static(
+        self,
+        base: np.ndarray,
+        box: Optional[np.ndarray],
+        mel_windows: np.ndarray,
+        mel_starts: np.ndarray,
+        budget: RenderMemoryBudget,
+        encoder: RawVideoEncoder,
+        priority: int,
+        profile: Optional[RenderProfile] = None,
+    ) -> None:
+        """Single base frame: one crop reused for every chunk, one canvas whose face ROI is restored per frame"""
+        count = len(mel_starts)
+        base = np.ascontiguousarray(base)
+        if box is None:
+            for _ in range(count):
+                encoder.write(base)
+            return
+        
+        width, height = self.config.face_resolution
+        chunk_size = max(1, min(self.config.wav2lip_batch_size, count))
+        face = np.empty((1, height, width, 3), dtype=np.uint8)
+        self._crop_faces(base[np.newaxis], np.zeros(1, dtype=np.intp), box[np.newaxis], face)
+        faces = np.repeat(face, chunk_size, axis=0)
+        
+        budget.reserve(base.nbytes, "static canvas")
+        canvas = base.copy()
+        x_min, y_min, x_max, y_max = (int(v) for v in box)
+        roi = (slice(max(0, y_min), max(0, y_max)), slice(max(0, x_min), max(0, x_max)))
+        scratch = np.empty(base.shape, dtype=np.uint8)
+        pending: deque = deque()
+        
+        def _finish() -> None:
+            nonlocal scratch
+            future, submitted = pending.popleft()
+            wait_start = time.perf_counter()
+            generated = future.result()
+            if profile is not None:
+                done = time.perf_counter()
+                profile.batch(done - submitted, done - wait_start, len(generated))
+            for face_out in generated:
+                canvas[roi] = base[roi]
+                scratch = self._composite_face(canvas, face_out, box, scratch)
+                encoder.write(canvas)
+        
+        for start in range(0, count, chunk_size):
+            n = min(chunk_size, count - start)
+            mels = np.ascontiguousarray(mel_windows[mel_starts[start:start + n]], dtype=np.float32)
+            pending.append((self._batcher.submit(faces[:n], mels, priority), time.perf_counter()))
+            if len(pending) > 1:
+                _finish()
+        while pending:
+            _finish()
     
     def _audio_to_mel(self, audio_data: np.ndarray) -> np.ndarray:
         """Convert audio to mel spectrogram"""
-        from audio import load_wav, melspectrogram
+        from wav2lip_audio import melspectrogram
         
         if audio_data.dtype != np.float32:
             audio_data = audio_data.astype(np.float32)
         
         audio_data = audio_data / np.max(np.abs(audio_data))
-        mel = melspectrogram(audio_data)
+        mel = melspectrogram(audio_data, self.config.audio_sample_rate, self.config.mel_hop_size)
         
         if np.isnan(mel.reshape(-1)).sum() > 0:
             raise ValueError("Mel spectrogram contained NaN values")
         
         return mel.clip(-6, 2)
     
-    def _create_mel_chunks(self, mel: np.ndarray, chunk_size: int = 16) -> list[np.ndarray]:
-        """Create mel spectrogram chunks for inference"""
-        mel_chunks = []
-        i = 0
-        while i < (mel.shape[1] - chunk_size):
-            mel_chunks.append(mel[:, i:i + chunk_size])
-            i += 1
-        return mel_chunks
-    
-    def _crop_face(self, frame: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
-        """Crop face from frame using landmarks"""
-        x_min = int(np.min(landmarks[:, 0]))
-        x_max = int(np.max(landmarks[:, 0]))
-        y_min = int(np.min(landmarks[:, 1]))
-        y_max = int(np.max(landmarks[:, 1]))
-        
-        pad_x = int((x_max - x_min) * 0.1)
-        pad_y = int((y_max - y_min) * 0.1)
-        
-        x_min = max(0, x_min - pad_x)
-        x_max = min(frame.shape[1], x_max + pad_x)
-        y_min = max(0, y_min - pad_y)
-        y_max = min(frame.shape[0], y_max + pad_y)
-        
-        return frame[y_min:y_max, x_min:x_max]
-    
-    def _composite_face(self, original: np.ndarray, generated: np.ndarray, landmarks: np.ndarray) -> np.ndarray:
-        """Composite generated face back into original frame"""
-        import cv2
+    def _create_mel_chunks(self, mel: np.ndarray, fps: float) -> tuple[np.ndarray, np.ndarray]:
+        """Frame-aligned mel windows as a strided (windows, 80, step) view plus one start index per video frame"""
+        step = self.config.mel_step_size
+        if mel.shape[1] < step:
+            mel = np.pad(mel, ((0, 0), (0, step - mel.shape[1])), mode="edge")
+        total = mel.shape[1]
         
-        x_min = int(np.min(landmarks[:, 0]))
-        x_max = int(np.max(landmarks[:, 0]))
-        y_min = int(np.min(landmarks[:, 1]))
-        y_max = int(np.max(landmarks[:, 1]))
+        # Same indexing as upstream Wav2Lip's mel_idx_multiplier loop: window i starts
+        # at int(i * mel_frames_per_second / fps); the last one is clamped to the end.
+        mel_idx_multiplier = self.config.audio_sample_rate / self.config.mel_hop_size / fps
+        candidates = (np.arange(int(np.ceil(total / mel_idx_multiplier)) + 1) * mel_idx_multiplier).astype(np.int64)
+        starts = np.append(candidates[candidates + step <= total], total - step)
         
-        generated_resized = cv2.resize(generated, (x_max - x_min, y_max - y_min))
+        windows = np.lib.stride_tricks.sliding_window_view(mel, step, axis=1).transpose(1, 0, 2)
+        return windows, starts
+    
+    def _crop_faces(self, frames: np.ndarray, frame_ids: np.ndarray, boxes: np.ndarray, out: np.ndarray) -> None:
+        """Crop and resize a batch of face boxes straight into the batch buffer"""
+        import cv2
         
-        mask = np.ones((y_max - y_min, x_max - x_min), dtype=np.float32)
-        feather = 10
-        mask[:feather, :] *= np.linspace(0, 1, feather)[:, np.newaxis]
-        mask[-feather:, :] *= np.linspace(1, 0, feather)[:, np.newaxis]
-        mask[:, :feather] *= np.linspace(0, 1, feather)[np.newaxis, :]
-        mask[:, -feather:] *= np.linspace(1, 0, feather)[np.newaxis, :]
+        size = (out.shape[2], out.shape[1])
+        for slot, (frame_id, box) in enumerate(zip(frame_ids, boxes)):
+            x_min, y_min, x_max, y_max = (int(v) for v in box)
+            cv2.resize(frames[frame_id, y_min:y_max, x_min:x_max], size, dst=out[slot])
+    
+    def _feather_weights(self, width: int, height: int) -> tuple[np.ndarray, np.ndarray]:
+        """Cached (generated, original) float32 blend weights for a box size"""
+        weights = self._feather_cache.get((width, height))
+        if weights is not None:
+            return weights
         
-        result = original.copy()
-        result[y_min:y_max, x_min:x_max] = (
-            original[y_min:y_max, x_min:x_max] * (1 - mask[:, :, np.newaxis]) +
-            generated_resized * mask[:, :, np.newaxis]
-        )
+        def _ramp(length: int) -> np.ndarray:
+            ramp = np.ones(length, dtype=np.float32)
+            feather = min(_COMPOSITE_FEATHER_PX, length // 2)
+            if feather > 0:
+                ramp[:feather] *= np.linspace(0, 1, feather, dtype=np.float32)
+                ramp[-feather:] *= np.linspace(1, 0, feather, dtype=np.float32)
+            return ramp
         
-        return result
+        mask = np.outer(_ramp(height), _ramp(width))
+        if len(self._feather_cache) >= _FEATHER_CACHE_SIZE:
+            self._feather_cache.clear()
+        weights = (mask, 1.0 - mask)
+        self._feather_cache[(width, height)] = weights
+        return weights
     
-    async def _assemble_video(self, frames: list[np.ndarray], audio_path: Path, output_path: Path) -> None:
-        """Assemble frames into final video with audio"""
-        def _assemble():
-            import cv2
-            
-            if len(frames) == 0:
-                raise ValueError("No frames to assemble")
-            
-            height, width = frames[0].shape[:2]
-            
-            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-            temp_video = output_path.with_suffix(".temp.mp4")
-            out = cv2.VideoWriter(str(temp_video), fourcc, 25, (width, height))
-            
-            for frame in frames:
-                out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-            
-            out.release()
-            
-            (
-                ffmpeg
-                .input(str(temp_video))
-                .input(str(audio_path))
-                .output(
-                    str(output_path),
-                    vcodec="libx264",
-                    acodec="aac",
-                    audio_bitrate="192k",
-                    preset="fast",
-                    movflags="faststart",
-                )
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
-            
-            temp_video.unlink(missing_ok=True)
+    def _composite_face(
+        self,
+        frame: np.ndarray,
+        generated: np.ndarray,
+        box: np.ndarray,
+        scratch: np.ndarray,
+    ) -> np.ndarray:
+        """Blend a generated face into frame in place; returns the (possibly grown) scratch buffer"""
+        import cv2
+        
+        x_min, y_min, x_max, y_max = (int(v) for v in box)
+        box_w, box_h = x_max - x_min, y_max - y_min
+        if box_w <= 0 or box_h <= 0:
+            return scratch
+        if scratch.shape[0] < box_h or scratch.shape[1] < box_w:
+            scratch = np.empty((max(box_h, scratch.shape[0]), max(box_w, scratch.shape[1]), 3), dtype=np.uint8)
+        
+        # Only the part of the box inside the frame is blended.
+        frame_h, frame_w = frame.shape[:2]
+        left, top = max(0, -x_min), max(0, -y_min)
+        right, bottom = box_w - max(0, x_max - frame_w), box_h - max(0, y_max - frame_h)
+        if right <= left or bottom <= top:
+            return scratch
         
-        await asyncio.to_thread(_assemble)
+        resized = scratch[:box_h, :box_w]
+        cv2.resize(generated, (box_w, box_h), dst=resized)
+        weights, inverse = self._feather_weights(box_w, box_h)
+        roi = frame[y_min + top:y_min + bottom, x_min + left:x_min + right]
+        cv2.blendLinear(
+            resized[top:bottom, left:right],
+            roi,
+            weights[top:bottom, left:right],
+            inverse[top:bottom, left:right],
+            dst=roi,
+        )
+        return scratch
+    
+    async def _assemble_video(self, encoder: RawVideoEncoder) -> None:
+        """Finish the single-pass encode: flush the frame pipe and wait for the muxed output"""
+        await self._stage.run(encoder.close)
 
 
 class EnterpriseLipSyncService:
@@ -364,8 +1108,11 @@ class EnterpriseLipSyncService:
     def __init__(self, config: Optional[Wav2LipConfig] = None):
         self.config = config or Wav2LipConfig()
         self._model: Optional[Wav2LipModel] = None
-        self._cache: dict[str, bytes] = {}
-        self._cache_max_size = 100
+        self._render_cache: Optional[RenderCache] = (
+            RenderCache(self.config.render_cache_dir, self.config.render_cache_max_mb * 1024 * 1024)
+            if self.config.render_cache_dir
+            else None
+        )
         self._request_count = 0
         self._total_latency_ms = 0.0
     
@@ -373,35 +1120,75 @@ class EnterpriseLipSyncService:
         """Initialize the service and warm up the model"""
         self._model = await Wav2LipModel.get_instance(self.config)
     
+    async def register_avatar(self, face_video_path: Path) -> None:
+        """Pre-decode an avatar so its renders skip video decoding"""
+        if self._model is None:
+            raise RuntimeError("Service not initialized")
+        await self._model.register_avatar(face_video_path)
+    
     async def render(
         self,
         face_video_path: Path,
         audio_wav_path: Path,
         output_path: Path,
         use_cache: bool = True,
+        priority: int = 0,
+        profile: Optional[bool] = None,
     ) -> LatencyMetrics:
         """Render lip-synced video with enterprise features"""
         self._request_count += 1
         
-        cache_key = f"{face_video_path}:{audio_wav_path}"
-        if use_cache and cache_key in self._cache:
-            output_path.write_bytes(self._cache[cache_key])
-            return LatencyMetrics(
+        if self._model is None:
+            raise RuntimeError("Service not initialized")
+        model = self._model
+        
+        if not use_cache or self._render_cache is None:
+            metrics = await model.render_lipsync(face_video_path, audio_wav_path, output_path, priority, profile)
+            self._total_latency_ms += metrics.total_time_ms
+            return metrics
+        
+        start_time = time.perf_counter()
+        cache_key = await asyncio.to_thread(
+            RenderCache.make_key, face_video_path, audio_wav_path, render_fingerprint(self.config)
+        )
+        rendered = await self._render_cache.get_or_render(
+            cache_key,
+            output_path,
+            lambda: model.render_lipsync(face_video_path, audio_wav_path, output_path, priority, profile),
+            lambda result: result.success,
+        )
+        if rendered is None:
+            rendered = LatencyMetrics(
                 success=True,
-                total_time_ms=0.0,
-                gpu_memory_used_mb=await self._model.get_gpu_memory_usage() if self._model else 0.0,
+                total_time_ms=(time.perf_counter() - start_time) * 1000,
+                gpu_memory_used_mb=await model.get_gpu_memory_usage(),
             )
         
+        self._total_latency_ms += rendered.total_time_ms
+        return rendered
+    
+    async def render_to_stream(
+        self,
+        face_video_path: Path,
+        audio_wav_path: Path,
+        streamer: Any,
+        priority: int = 0,
+    ) -> tuple[LatencyMetrics, dict[str, Any]]:
+        """
+        Render onto a client's media stream (a WebRTCVideoStreamer), playing frames and
+        audio out as they are generated; returns the render metrics and play-out stats
+        """
+        self._request_count += 1
+        
         if self._model is None:
             raise RuntimeError("Service not initialized")
         
-        metrics = await self._model.render_lipsync(face_video_path, audio_wav_path, output_path)
-        
-        if use_cache and metrics.success and len(self._cache) < self._cache_max_size:
-            self._cache[cache_key] = output_path.read_bytes()
-        
+        sink = streamer.frame_sink()
+        playout = asyncio.create_task(streamer.play(sink))
+        metrics = await self._model.render_frames(face_video_path, audio_wav_path, sink, priority)
+        stats = await playout
         self._total_latency_ms += metrics.total_time_ms
-        return metrics
+        return metrics, stats
     
     def get_average_latency_ms(self) -> float:
         """Get average latency across all requests"""
@@ -414,12 +1201,14 @@ class EnterpriseLipSyncService:
         return {
             "request_count": self._request_count,
             "average_latency_ms": self.get_average_latency_ms(),
-            "cache_size": len(self._cache),
-            "cache_max_size": self._cache_max_size,
+            "cache": self._render_cache.stats() if self._render_cache else None,
             "gpu_acceleration_enabled": self.config.enable_gpu_acceleration,
             "gpu_id": self.config.gpu_id,
+            "resources": self._model.get_resource_layout() if self._model else None,
+            "inference": self._model.get_inference_stats() if self._model else None,
         }
     
     async def clear_cache(self) -> None:
         """Clear the result cache"""
-        self._cache.clear()
+        if self._render_cache is not None:
+            await asyncio.to_thread(self._render_cache.clear)